@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Load the check-in code index before the first scan arrives
+from guest.checkin import warm_code_index  # noqa: E402
+
+warm_code_index()
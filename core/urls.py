@@ -19,9 +19,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from guest import views as guest_views
+from guest.badges import BADGE_DIR
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('guest.urls')),
+    # Badges are served by the app in every environment so they get long-lived cache headers and range support
+    path(f"{settings.MEDIA_URL.lstrip('/')}{BADGE_DIR}/<path:name>", guest_views.badge_media, name='badge_media'),
 ]
 
 if settings.DEBUG:
@@ -1,17 +1,25 @@
 from django.contrib import admin
-from .models import Guest
+from .models import Guest, GuestImport, Job
+from django.urls import reverse
 from django.utils.html import format_html
-import openpyxl
-from django.http import HttpResponse
+from .badges import badge_thumbnail_url
+from .exports import xlsx_response
+from .search import search_guests
 
 @admin.register(Guest)
 class GuestAdmin(admin.ModelAdmin):
-    list_display = ('full_name', 'email', 'phone_number', 'qr_code_value', 'qr_thumbnail')
+    list_display = ('full_name', 'email', 'phone_number', 'qr_code_value', 'badge_status', 'checked_in_at', 'qr_thumbnail')
+    list_filter = ('badge_status', ('checked_in_at', admin.EmptyFieldListFilter))
     search_fields = ('full_name', 'email', 'phone_number', 'qr_code_value')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Same indexed substring search as the dashboard instead of per-field LIKE scans
+        return search_guests(queryset, search_term), False
+
     def qr_thumbnail(self, obj):
         if obj.qr_image:
-            return format_html('<img src="{}" width="50" />', obj.qr_image.url)
+            url = badge_thumbnail_url(obj) or reverse('badge_thumbnail', args=[obj.qr_code_value])
+            return format_html('<img src="{}" width="50" />', url)
         return "-"
     qr_thumbnail.short_description = "QR Code"
 
@@ -19,14 +27,19 @@ class GuestAdmin(admin.ModelAdmin):
     actions = ['export_as_excel']
 
     def export_as_excel(self, request, queryset):
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.title = 'Guests'
-        sheet.append(['Full Name', 'Email', 'Phone Number', 'QR Code'])
-        for guest in queryset:
-            sheet.append([guest.full_name, guest.email, guest.phone_number, guest.qr_code_value])
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename=guests.xlsx'
-        workbook.save(response)
-        return response
+        return xlsx_response(queryset, 'guests.xlsx')
     export_as_excel.short_description = "Export Selected Guests to Excel"
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'guest', 'status', 'attempts', 'run_at', 'created_at')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('last_error',)
+
+
+@admin.register(GuestImport)
+class GuestImportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'original_name', 'status', 'rows_processed', 'imported', 'skipped', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('rows_processed', 'imported', 'skipped', 'error', 'started_at', 'finished_at')
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .metrics import span
+
+
+LOGO_PATH = os.path.join(settings.BASE_DIR, "guest", "static", "images", "event-logo.jpg")
+
+# qrcode's default module size in pixels; the QR is placed at this size shrunk by QR_FACTOR
+QR_BOX_SIZE = 10
+QR_FACTOR = 4
+QR_MARGIN = 10
+# Bounding box for list-view thumbnails
+THUMBNAIL_SIZE = (160, 160)
+
+BADGE_DIR = "qr_codes"
+THUMBNAIL_DIR = "qr_codes/thumbs"
+# PNG for compatibility, WebP for the dashboard (a fraction of the bytes)
+THUMBNAIL_FORMATS = ("png", "webp")
+
+# Anything that changes the rendered pixels belongs here so it invalidates stored badges
+RENDER_PARAMS = {
+    "error_correction": "H",
+    "box_size": QR_BOX_SIZE,
+    "factor": QR_FACTOR,
+    "margin": QR_MARGIN,
+    "qr": "matrix-nearest",
+    "palette": settings.BADGE_PNG_PALETTE,
+    "thumbnail": THUMBNAIL_SIZE,
+    "thumbnail_formats": THUMBNAIL_FORMATS,
+    "webp_quality": settings.BADGE_WEBP_QUALITY,
+}
+
+
+class LogoTemplate:
+    """
+    Event logo, read once per process and reloaded when the file changes.
+
+    The content hash (for badge keys) only needs the bytes; the decoded RGBA
+    image is built on first use, so processes that never render don't load
+    Pillow.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+        self._image = None
+        self._mtime = None
+        self._version = None
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if self._data is None or mtime != self._mtime:
+            with self._lock:
+                if self._data is None or mtime != self._mtime:
+                    with open(self.path, "rb") as f:
+                        data = f.read()
+                    self._data = data
+                    self._image = None
+                    self._version = hashlib.sha256(data).hexdigest()[:12]
+                    self._mtime = mtime
+
+    def get(self):
+        self._load()
+        with self._lock:
+            if self._image is None:
+                from PIL import Image
+
+                with Image.open(BytesIO(self._data)) as src:
+                    image = src.convert("RGBA")
+                image.load()
+                self._image = image
+            return self._image
+
+    def copy(self):
+        return self.get().copy()
+
+    @property
+    def version(self):
+        """Content hash of the logo file, so a replaced logo marks every badge stale"""
+        self._load()
+        return self._version
+
+
+logo_template = LogoTemplate(LOGO_PATH)
+
+
+# ---------------------------
+# STORAGE
+# ---------------------------
+
+def badge_key(code):
+    """Hash of everything that determines a badge's pixels"""
+    params = ",".join(f"{name}={value}" for name, value in sorted(RENDER_PARAMS.items()))
+    source = f"{code}|{logo_template.version}|{params}"
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def badge_name(code, key):
+    return f"{BADGE_DIR}/{code}-{key}.png"
+
+
+def thumbnail_name(code, key, fmt="png"):
+    return f"{THUMBNAIL_DIR}/{code}-{key}.{fmt}"
+
+
+def is_stale(guest, key=None, check_files=True):
+    key = key or badge_key(guest.qr_code_value)
+    if guest.badge_hash != key or not guest.qr_image:
+        return True
+    if check_files:
+        names = [guest.qr_image.name] + [thumbnail_name(guest.qr_code_value, key, fmt) for fmt in THUMBNAIL_FORMATS]
+        return not all(default_storage.exists(name) for name in names)
+    return False
+
+
+def _write(name, data):
+    # Names are content-addressed, so an existing file already holds these bytes
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+
+
+def store_badge(guest, key, png, *thumbnails):
+    """
+    Persist rendered badge files under their content-hashed names and point
+    the guest at them. A badge that hasn't been emailed yet becomes ready.
+    """
+    # Not at module level: the render pool's spawned workers import this before Django is set up
+    from .models import Guest
+
+    name = badge_name(guest.qr_code_value, key)
+    _write(name, png)
+    for fmt, thumbnail in zip(THUMBNAIL_FORMATS, thumbnails):
+        _write(thumbnail_name(guest.qr_code_value, key, fmt), thumbnail)
+
+    old_name = guest.qr_image.name if guest.qr_image else None
+    old_hash = guest.badge_hash
+    guest.qr_image.name = name
+    guest.badge_hash = key
+    update_fields = ["qr_image", "badge_hash"]
+    if guest.badge_status != Guest.BADGE_SENT:
+        guest.badge_status = Guest.BADGE_READY
+        update_fields.append("badge_status")
+    guest.save(update_fields=update_fields)
+
+    if old_name and old_name != name:
+        default_storage.delete(old_name)
+        if old_hash:
+            for fmt in THUMBNAIL_FORMATS:
+                default_storage.delete(thumbnail_name(guest.qr_code_value, old_hash, fmt))
+
+
+def ensure_badge(guest, force=False):
+    """Render and store the guest's badge unless an up-to-date one exists; returns True if rendered"""
+    key = badge_key(guest.qr_code_value)
+    if not force and not is_stale(guest, key):
+        return False
+    from .rendering import render_badge_files
+
+    with span('qr_render'):
+        files = render_badge_files(guest.qr_code_value)
+    store_badge(guest, key, *files)
+    return True
+
+
+def badge_thumbnail_url(guest, fmt="webp"):
+    if not guest.qr_image or not guest.badge_hash:
+        return None
+    return default_storage.url(thumbnail_name(guest.qr_code_value, guest.badge_hash, fmt))
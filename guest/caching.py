@@ -0,0 +1,57 @@
+import hashlib
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+LIST_VERSION_KEY = 'guests:list-version'
+
+SUCCESS_PAGE_TIMEOUT = 3600
+# A pending badge's page changes as soon as the worker renders it
+PENDING_PAGE_TIMEOUT = 5
+LIST_TIMEOUT = 60
+
+
+def page_cache():
+    """
+    The 'pages' cache: success pages and dashboard list pages. It is a dummy
+    cache unless CACHE_BACKEND is shared by every process, since invalidation
+    from another process (the worker finishing an import) can't reach a
+    per-process locmem cache.
+    """
+    return caches['pages']
+
+
+def success_key(code):
+    return f'guests:success:{code}'
+
+
+def list_key(params):
+    """Cache key for one dashboard list page; any guest change moves every list page to a new key"""
+    cache = page_cache()
+    version = cache.get(LIST_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(LIST_VERSION_KEY, version, None)
+    digest = hashlib.sha1(repr(sorted(params)).encode()).hexdigest()
+    return f'guests:list:{version}:{digest}'
+
+
+def _invalidate(codes):
+    cache = page_cache()
+    if codes:
+        cache.delete_many([success_key(code) for code in codes])
+    cache.set(LIST_VERSION_KEY, time.time_ns(), None)
+
+
+def guests_changed(codes=()):
+    """
+    Drop cached success pages for `codes` and every dashboard list page.
+
+    save() and delete() call this through signals; code that changes guests
+    with update(), bulk_update() or bulk_create() must call it itself. Runs
+    once the surrounding transaction commits, so a concurrent request can't
+    re-cache the old rows.
+    """
+    codes = list(codes)
+    transaction.on_commit(lambda: _invalidate(codes))
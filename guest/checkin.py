@@ -0,0 +1,324 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import stats
+from .caching import guests_changed
+from .models import Guest, GuestTombstone
+
+logger = logging.getLogger(__name__)
+
+
+class CodeIndex:
+    """
+    Per-process map of QR code -> (guest id, full name, checked_in_at).
+
+    Saves the code lookup on every scan. Kept current in this process by the
+    Guest save/delete signals; rows created elsewhere (another worker, bulk
+    imports) are picked up from the database on first miss.
+    """
+
+    FIELDS = frozenset({'qr_code_value', 'full_name', 'checked_in_at'})
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_code = {}
+        self._code_by_pk = {}
+        self.warmed = False
+
+    def warm(self):
+        rows = Guest.objects.values_list('qr_code_value', 'pk', 'full_name', 'checked_in_at')
+        by_code, code_by_pk = {}, {}
+        for code, pk, full_name, checked_in_at in rows.iterator(chunk_size=5000):
+            by_code[code] = (pk, full_name, checked_in_at)
+            code_by_pk[pk] = code
+        with self._lock:
+            self._by_code, self._code_by_pk = by_code, code_by_pk
+            self.warmed = True
+        return len(by_code)
+
+    def set_entry(self, code, pk, full_name, checked_in_at):
+        with self._lock:
+            old_code = self._code_by_pk.get(pk)
+            if old_code is not None and old_code != code:
+                self._by_code.pop(old_code, None)
+            self._by_code[code] = (pk, full_name, checked_in_at)
+            self._code_by_pk[pk] = code
+
+    def put(self, guest, update_fields=None):
+        """Refresh `guest`'s entry after a save that wrote `update_fields` (None: every field)"""
+        if update_fields is not None and self.FIELDS.isdisjoint(update_fields):
+            return
+        if self.FIELDS & guest.get_deferred_fields():
+            # Loaded with only()/defer(): drop the entry rather than query for it; the next scan re-reads it
+            self.discard(guest.pk)
+            return
+        self.set_entry(guest.qr_code_value, guest.pk, guest.full_name, guest.checked_in_at)
+
+    def discard(self, pk):
+        with self._lock:
+            code = self._code_by_pk.pop(pk, None)
+            if code is not None:
+                self._by_code.pop(code, None)
+
+    def get(self, code):
+        entry = self._by_code.get(code)
+        if entry is not None:
+            return entry
+        row = (
+            Guest.objects.filter(qr_code_value=code)
+            .values_list('pk', 'full_name', 'checked_in_at')
+            .first()
+        )
+        if row is None:
+            return None
+        self.set_entry(code, *row)
+        return row
+
+    async def aget(self, code):
+        entry = self._by_code.get(code)
+        if entry is not None:
+            return entry
+        row = await (
+            Guest.objects.filter(qr_code_value=code)
+            .values_list('pk', 'full_name', 'checked_in_at')
+            .afirst()
+        )
+        if row is None:
+            return None
+        self.set_entry(code, *row)
+        return row
+
+    def clear(self):
+        with self._lock:
+            self._by_code.clear()
+            self._code_by_pk.clear()
+            self.warmed = False
+
+
+code_index = CodeIndex()
+
+
+def warm_code_index():
+    """Load every code at process start; a missing or unmigrated database is not fatal"""
+    try:
+        count = code_index.warm()
+        logger.info("Check-in code index warmed with %s guest(s)", count)
+    except DatabaseError as e:
+        logger.warning("Could not warm check-in code index: %s", e)
+    finally:
+        # Don't hand an open connection to forked workers
+        connections.close_all()
+
+
+def check_in(code):
+    """
+    Admit the guest holding `code`.
+
+    Returns None for an unknown code, otherwise a dict with the guest's name,
+    whether they had already been admitted, and when. The conditional UPDATE
+    makes this safe when several scanners read the same code at once: only
+    one of them can move checked_in_at from NULL.
+    """
+    entry = code_index.get(code)
+    if entry is None:
+        return None
+    pk, full_name, checked_in_at = entry
+
+    now = timezone.now()
+    with transaction.atomic():
+        admitted = Guest.objects.filter(pk=pk, checked_in_at__isnull=True).update(checked_in_at=now, updated_at=now)
+        if admitted:
+            stats.record([({'checked_in_at': None}, {'checked_in_at': now})])
+    if admitted:
+        code_index.set_entry(code, pk, full_name, now)
+        guests_changed()
+        return {'code': code, 'full_name': full_name, 'already_checked_in': False, 'checked_in_at': now}
+
+    if checked_in_at is None:
+        # Admitted by another process since we cached the entry
+        checked_in_at = Guest.objects.filter(pk=pk).values_list('checked_in_at', flat=True).first()
+        if checked_in_at is None:
+            # Deleted since we cached it
+            code_index.discard(pk)
+            return None
+        code_index.set_entry(code, pk, full_name, checked_in_at)
+    return {'code': code, 'full_name': full_name, 'already_checked_in': True, 'checked_in_at': checked_in_at}
+
+
+async def acheck_in(code):
+    """check_in() for async views, on the async ORM"""
+    entry = await code_index.aget(code)
+    if entry is None:
+        return None
+    pk, full_name, checked_in_at = entry
+
+    now = timezone.now()
+    admitted = await Guest.objects.filter(pk=pk, checked_in_at__isnull=True).aupdate(checked_in_at=now, updated_at=now)
+    if admitted:
+        code_index.set_entry(code, pk, full_name, now)
+        # Outside the update's transaction (the async ORM has none); reconcile() covers a crash in between
+        await sync_to_async(stats.record)([({'checked_in_at': None}, {'checked_in_at': now})])
+        await sync_to_async(guests_changed)()
+        return {'code': code, 'full_name': full_name, 'already_checked_in': False, 'checked_in_at': now}
+
+    if checked_in_at is None:
+        checked_in_at = await Guest.objects.filter(pk=pk).values_list('checked_in_at', flat=True).afirst()
+        if checked_in_at is None:
+            code_index.discard(pk)
+            return None
+        code_index.set_entry(code, pk, full_name, checked_in_at)
+    return {'code': code, 'full_name': full_name, 'already_checked_in': True, 'checked_in_at': checked_in_at}
+
+
+# ---------------------------
+# OFFLINE SYNC
+# ---------------------------
+
+MAX_BATCH_SCANS = 5000
+LOOKUP_CHUNK_SIZE = 500
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def to_version(moment):
+    """Manifest versions are change timestamps in integer microseconds since the epoch"""
+    if moment is None:
+        return 0
+    return (moment - EPOCH) // MICROSECOND
+
+
+def from_version(version):
+    return EPOCH + version * MICROSECOND
+
+
+def manifest_version():
+    latest_guest = Guest.objects.aggregate(latest=Max('updated_at'))['latest']
+    latest_delete = GuestTombstone.objects.aggregate(latest=Max('deleted_at'))['latest']
+    return max(to_version(latest_guest), to_version(latest_delete))
+
+
+def build_manifest(since=None):
+    """
+    Everything a scanner needs to check guests in offline.
+
+    With `since` (a version from an earlier manifest) only guests changed after
+    it and codes deleted after it are included. Guests are compact
+    [code, full_name, checked_in] triples.
+
+    A change's timestamp is taken before its transaction commits, so it can
+    become visible after a manifest that already reported a later version.
+    Deltas therefore reach CHECKIN_MANIFEST_OVERLAP seconds further back, and
+    repeat some entries: scanners apply them as upserts keyed by code.
+    """
+    version = manifest_version()
+    guests = Guest.objects.all()
+    removed = []
+    if since:
+        moment = from_version(since) - timedelta(seconds=settings.CHECKIN_MANIFEST_OVERLAP)
+        guests = guests.filter(updated_at__gt=moment)
+        removed = list(
+            GuestTombstone.objects.filter(deleted_at__gt=moment).values_list('code', flat=True).distinct()
+        )
+    rows = guests.order_by('pk').values_list('qr_code_value', 'full_name', 'checked_in_at')
+    return {
+        'version': version,
+        'since': since or None,
+        'full': not since,
+        'guests': [[code, full_name, checked_in_at is not None] for code, full_name, checked_in_at in rows.iterator(chunk_size=5000)],
+        'removed': removed,
+    }
+
+
+def _scan_time(value, now):
+    if not value:
+        return now
+    moment = parse_datetime(str(value))
+    if moment is None:
+        raise ValueError(f"Invalid scanned_at: {value}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    # Offline queues sync within the event; an older stamp is a bad clock or a forged back-dated admission
+    if moment < now - timedelta(seconds=settings.CHECKIN_SCAN_MAX_AGE):
+        raise ValueError(f"scanned_at is too far in the past: {value}")
+    # A scanner clock running ahead must not post-date an admission
+    return min(moment, now)
+
+
+def apply_scans(scans):
+    """
+    Apply a batch of queued offline scans in one transaction.
+
+    Scans are dicts with `code` and optional ISO `scanned_at`. For each guest
+    the earliest scan wins: it sets checked_in_at unless an earlier check-in is
+    already recorded. Each code gets one result: admitted (this batch holds the
+    first scan), already_checked_in, unknown or invalid (an unparseable
+    scanned_at, or one older than CHECKIN_SCAN_MAX_AGE).
+    """
+    now = timezone.now()
+    earliest = {}
+    results = {}
+    for scan in scans:
+        code = str(scan.get('code') or '').strip().upper()
+        if not code:
+            continue
+        try:
+            scanned_at = _scan_time(scan.get('scanned_at'), now)
+        except ValueError as e:
+            results.setdefault(code, {'code': code, 'status': 'invalid', 'error': str(e)})
+            continue
+        if code not in earliest or scanned_at < earliest[code]:
+            earliest[code] = scanned_at
+            results.pop(code, None)
+
+    codes = list(earliest)
+    changed = []
+    moves = []
+    with transaction.atomic():
+        guests = {}
+        for start in range(0, len(codes), LOOKUP_CHUNK_SIZE):
+            chunk = codes[start:start + LOOKUP_CHUNK_SIZE]
+            for guest in Guest.objects.select_for_update().filter(qr_code_value__in=chunk).only(
+                'pk', 'qr_code_value', 'full_name', 'checked_in_at',
+            ):
+                guests[guest.qr_code_value] = guest
+        # Stamped once the row locks are held, to keep the gap to commit (see build_manifest) short
+        changed_at = timezone.now()
+
+        for code in codes:
+            guest = guests.get(code)
+            if guest is None:
+                results[code] = {'code': code, 'status': 'unknown'}
+                continue
+            scanned_at = earliest[code]
+            if guest.checked_in_at is None or scanned_at < guest.checked_in_at:
+                moves.append(({'checked_in_at': guest.checked_in_at}, {'checked_in_at': scanned_at}))
+                guest.checked_in_at = scanned_at
+                guest.updated_at = changed_at
+                changed.append(guest)
+                status = 'admitted'
+            else:
+                status = 'already_checked_in'
+            results[code] = {
+                'code': code,
+                'status': status,
+                'full_name': guest.full_name,
+                'checked_in_at': guest.checked_in_at,
+            }
+
+        Guest.objects.bulk_update(changed, ['checked_in_at', 'updated_at'], batch_size=LOOKUP_CHUNK_SIZE)
+        if changed:
+            # A guest already admitted who scanned earlier elsewhere moves between days
+            stats.record(moves)
+            guests_changed()
+
+    for guest in changed:
+        code_index.set_entry(guest.qr_code_value, guest.pk, guest.full_name, guest.checked_in_at)
+    return list(results.values())
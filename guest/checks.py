@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .ratelimit import BUCKETS, parse_rate
+
+
+@register()
+def check_rate_limits(app_configs, **kwargs):
+    """A malformed rate would otherwise only surface as a 500 on the first request it limits"""
+    errors = []
+    for bucket in BUCKETS:
+        rate = getattr(settings, bucket.setting)
+        try:
+            parse_rate(rate)
+        except (TypeError, ValueError):
+            errors.append(Error(
+                f'{bucket.setting} is {rate!r}, not a rate.',
+                hint='Use "<burst>/<s|m|h|d>", e.g. "20/m", or leave it empty to disable the limit.',
+                id='guest.E001',
+            ))
+    return errors
@@ -0,0 +1,88 @@
+import secrets
+import string
+import threading
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 8
+CODE_SPACE = len(CODE_ALPHABET) ** CODE_LENGTH
+# Codes verified against the database per query; under SQLite's 999 bound parameters before 3.32
+CODE_BLOCK_SIZE = 900
+
+# Six random bytes per candidate; values past the last whole multiple of
+# CODE_SPACE are rejected so every code is equally likely
+_CANDIDATE_BYTES = 6
+_CANDIDATE_LIMIT = (256 ** _CANDIDATE_BYTES // CODE_SPACE) * CODE_SPACE
+
+
+def encode_code(number):
+    """Fixed-width base-36 representation of 0 <= number < CODE_SPACE"""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        number, digit = divmod(number, len(CODE_ALPHABET))
+        chars.append(CODE_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def random_codes(count):
+    """`count` distinct codes from the OS CSPRNG"""
+    codes = set()
+    while len(codes) < count:
+        needed = count - len(codes)
+        data = secrets.token_bytes(needed * _CANDIDATE_BYTES)
+        for offset in range(0, len(data), _CANDIDATE_BYTES):
+            value = int.from_bytes(data[offset:offset + _CANDIDATE_BYTES], 'big')
+            if value < _CANDIDATE_LIMIT:
+                codes.add(encode_code(value % CODE_SPACE))
+    return codes
+
+
+class CodeAllocator:
+    """
+    Hands out QR codes that are unguessable and not yet used by any guest.
+
+    Codes are drawn in blocks and checked against guest_guest with one IN query
+    per block, so taking a code normally costs no query at all. The unique
+    constraint still backs this up: a code handed out here could in theory be
+    drawn by another process too, but with 36^8 codes that is vanishingly rare.
+    """
+
+    def __init__(self, block_size=CODE_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pool = []
+        self._pooled = set()
+        self.queries = 0
+
+    def _refill(self):
+        from .models import Guest
+
+        block = set()
+        while len(block) < self.block_size:
+            candidates = random_codes(self.block_size - len(block)) - block - self._pooled
+            taken = Guest.objects.filter(qr_code_value__in=candidates).values_list('qr_code_value', flat=True)
+            self.queries += 1
+            block |= candidates.difference(taken)
+        self._pool.extend(block)
+        self._pooled |= block
+
+    def take_many(self, count):
+        """`count` distinct codes, none of them used by a guest when checked"""
+        with self._lock:
+            while len(self._pool) < count:
+                self._refill()
+            split = len(self._pool) - count
+            codes = self._pool[split:]
+            del self._pool[split:]
+            self._pooled.difference_update(codes)
+        return codes
+
+    def take(self):
+        return self.take_many(1)[0]
+
+    def clear(self):
+        with self._lock:
+            self._pool.clear()
+            self._pooled.clear()
+
+
+allocator = CodeAllocator()
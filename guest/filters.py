@@ -0,0 +1,44 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .search import search_guests
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _date_param(params, name):
+    try:
+        return parse_date(params.get(name) or '')
+    except ValueError:
+        return None
+
+
+def filter_guests(queryset, params):
+    """
+    Narrow a Guest queryset by the optional list/export query parameters:
+
+    - date_from / date_to: registration date range (YYYY-MM-DD, inclusive)
+    - checked_in: true/false to keep only guests who have (not) checked in
+    - q: text contained in name, email, phone or code
+
+    Unparseable values are ignored rather than rejected.
+    """
+    date_from = _date_param(params, 'date_from')
+    date_to = _date_param(params, 'date_to')
+    # Compare against day boundaries so the created_at index can be used
+    if date_from:
+        queryset = queryset.filter(created_at__gte=_start_of(date_from))
+    if date_to:
+        queryset = queryset.filter(created_at__lt=_start_of(date_to + timedelta(days=1)))
+
+    checked_in = (params.get('checked_in') or '').lower()
+    if checked_in in ('1', 'true', 'yes'):
+        queryset = queryset.filter(checked_in_at__isnull=False)
+    elif checked_in in ('0', 'false', 'no'):
+        queryset = queryset.filter(checked_in_at__isnull=True)
+
+    return search_guests(queryset, params.get('q'))
@@ -0,0 +1,197 @@
+import logging
+import tempfile
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import stats
+from .caching import guests_changed
+from .codes import allocator
+from .models import Guest, GuestImport, ImportRowError, Job, normalize_email
+from .readers import ImportFileError, iter_rows
+
+logger = logging.getLogger(__name__)
+
+
+IMPORT_CHUNK_SIZE = 500
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+
+        self.row_errors = []
+
+    def skip(self, row_num, reason):
+        self.skipped += 1
+        self.errors.append(f"Row {row_num}: {reason}")
+        self.row_errors.append((row_num, reason))
+
+
+# ---------------------------
+# IMPORT PIPELINE
+# ---------------------------
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def import_chunk(chunk):
+    """
+    Validate and insert one chunk of rows; returns its ImportResult.
+
+    Costs one query for existing emails and one bulk insert. Codes come from
+    the allocator's pre-verified blocks and badge rendering is queued as jobs
+    rather than done inline.
+    """
+    result = ImportResult()
+    existing = set(
+        Guest.objects.filter(email_normalized__in={normalize_email(email) for _, _, email, _ in chunk if email})
+        .values_list('email_normalized', flat=True)
+    )
+
+    seen_emails = set()
+    accepted = []
+    for row_num, full_name, email, phone_number in chunk:
+        if not full_name or not email or not phone_number:
+            result.skip(row_num, "Missing required fields")
+            continue
+        key = normalize_email(email)
+        if key in existing or key in seen_emails:
+            result.skip(row_num, f"Email {email} already exists")
+            continue
+        seen_emails.add(key)
+        accepted.append((row_num, full_name, email, phone_number))
+
+    if not accepted:
+        return result
+
+    codes = allocator.take_many(len(accepted))
+    guests = [
+        Guest(
+            full_name=full_name, email=email, phone_number=phone_number, qr_code_value=code,
+            source=Guest.SOURCE_IMPORT,
+        )
+        for (_, full_name, email, phone_number), code in zip(accepted, codes)
+    ]
+    # bulk_create skips save(), so fill in the normalized lookup columns here
+    for guest in guests:
+        guest.normalize()
+    try:
+        with transaction.atomic():
+            guests = Guest.objects.bulk_create(guests)
+            # Badge rendering is deferred to the worker
+            Job.objects.bulk_create([Job(kind=Job.RENDER_BADGE, guest=guest) for guest in guests])
+            stats.record((None, stats.state(guest)) for guest in guests)
+            guests_changed()
+    except IntegrityError as e:
+        # A row the checks above let through, e.g. a code taken by another process meanwhile.
+        # Anything else (lock timeouts, dropped connections) propagates so the job retries
+        # the chunk from its checkpoint instead of recording its rows as skipped.
+        logger.exception("Import chunk failed")
+        for row_num, *_ in accepted:
+            result.skip(row_num, str(e)[:50])
+        return result
+
+    result.imported += len(guests)
+    return result
+
+
+def import_rows(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Create guests in bulk from a stream of parsed rows.
+
+    Rows are pulled `chunk_size` at a time, so memory stays bounded however long
+    the stream is. Earlier chunks are committed before later ones are checked,
+    so duplicates across chunks are caught by the email query.
+    """
+    result = ImportResult()
+    for chunk in _chunks(rows, chunk_size):
+        chunk_result = import_chunk(chunk)
+        result.imported += chunk_result.imported
+        result.skipped += chunk_result.skipped
+        result.errors += chunk_result.errors
+    return result
+
+
+# ---------------------------
+# BACKGROUND IMPORTS
+# ---------------------------
+
+def start_import(upload):
+    """Store an uploaded guest list in the database, where the worker can read it, and queue it"""
+    from .jobs import enqueue
+
+    with transaction.atomic():
+        guest_import = GuestImport.objects.create(content=b''.join(upload.chunks()), original_name=upload.name[:255])
+        enqueue(Job.IMPORT_GUESTS, payload={'import_id': guest_import.pk})
+    return guest_import
+
+
+def _upload_file(guest_import):
+    """
+    The stored upload as a local temporary file, so rows stream from disk rather
+    than from the database value; the bytes are only held while it is written.
+    """
+    f = tempfile.TemporaryFile()
+    f.write(GuestImport.objects.filter(pk=guest_import.pk).values_list('content', flat=True).get())
+    f.seek(0)
+    return f
+
+
+def run_import(guest_import, chunk_size=IMPORT_CHUNK_SIZE, heartbeat=None):
+    """
+    Import a stored upload chunk by chunk, resuming after the last checkpoint.
+
+    Each chunk's guests, its row errors and the advanced checkpoint
+    (rows_processed) commit in one transaction, so a worker that dies mid-file
+    picks up at the first uncommitted chunk with nothing imported twice.
+    `heartbeat` is called after every chunk so long imports aren't mistaken for
+    dead ones.
+    """
+    now = timezone.now()
+    GuestImport.objects.filter(pk=guest_import.pk).update(
+        status=GuestImport.RUNNING, started_at=Coalesce('started_at', Value(now)), updated_at=now,
+    )
+
+    with _upload_file(guest_import) as f:
+        try:
+            reader = iter_rows(f, guest_import.original_name)
+        except ImportFileError as e:
+            GuestImport.objects.filter(pk=guest_import.pk).update(
+                status=GuestImport.FAILED, error=str(e), finished_at=timezone.now(), updated_at=timezone.now(),
+            )
+            return
+        # Rows before the checkpoint were committed by an earlier attempt
+        rows = islice(reader, guest_import.rows_processed, None)
+
+        try:
+            for chunk in _chunks(rows, chunk_size):
+                with transaction.atomic():
+                    result = import_chunk(chunk)
+                    ImportRowError.objects.bulk_create([
+                        ImportRowError(guest_import=guest_import, row_num=row_num, reason=reason[:255])
+                        for row_num, reason in result.row_errors
+                    ])
+                    GuestImport.objects.filter(pk=guest_import.pk).update(
+                        rows_processed=F('rows_processed') + len(chunk),
+                        imported=F('imported') + result.imported,
+                        skipped=F('skipped') + result.skipped,
+                        updated_at=timezone.now(),
+                    )
+                if heartbeat:
+                    heartbeat()
+        finally:
+            # Let the reader clean up while its file is still open
+            reader.close()
+
+    GuestImport.objects.filter(pk=guest_import.pk).update(
+        status=GuestImport.DONE, finished_at=timezone.now(), updated_at=timezone.now(),
+    )
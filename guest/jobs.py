@@ -0,0 +1,188 @@
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .badges import ensure_badge
+from .importer import run_import
+from .mail import build_badge_email
+from .metrics import collect, span
+from .models import Guest, GuestImport, Job
+from .render_pool import render_stale
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of `kind`"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, guest=None, payload=None, delay=0):
+    return Job.objects.create(
+        kind=kind,
+        guest=guest,
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed `attempts` times"""
+    return min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+
+
+def requeue_stale():
+    """Put back jobs whose worker died mid-run"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_at=None,
+    )
+
+
+def claim(limit=10):
+    """Atomically claim up to `limit` due jobs for this worker"""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('run_at', 'id')
+        .values_list('pk', flat=True)[:limit]
+    )
+    claimed = []
+    for pk in list(candidates):
+        # Only one worker wins the QUEUED -> RUNNING transition
+        won = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if won:
+            claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).select_related('guest').order_by('run_at', 'id'))
+
+
+def run(job):
+    func = HANDLERS.get(job.kind)
+    start = time.perf_counter()
+    try:
+        if func is None:
+            raise ValueError(f"No handler registered for job kind {job.kind!r}")
+        with collect() as timings:
+            func(job)
+    except Exception as e:
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            job.status = Job.FAILED
+            logger.error("Job %s failed permanently: %s", job.pk, e)
+            on_failure = getattr(func, 'on_failure', None)
+            if on_failure:
+                on_failure(job)
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning("Job %s failed (attempt %s), retrying at %s: %s", job.pk, job.attempts, job.run_at, e)
+        job.save(update_fields=['status', 'run_at', 'locked_at', 'last_error'])
+        return False
+
+    job.status = Job.DONE
+    job.locked_at = None
+    job.last_error = ''
+    job.save(update_fields=['status', 'locked_at', 'last_error'])
+    logger.info(json.dumps({
+        'event': 'job',
+        'kind': job.kind,
+        'job': job.pk,
+        'ms': round((time.perf_counter() - start) * 1000, 2),
+        'queries': timings.queries,
+        'sql_ms': round(timings.sql_seconds * 1000, 2),
+        'spans': {name: round(seconds * 1000, 2) for name, seconds in timings.spans.items()},
+    }))
+    return True
+
+
+BADGE_JOBS = (Job.SEND_BADGE, Job.RENDER_BADGE)
+
+
+def prerender(jobs):
+    """Render the batch's badges in parallel so the handlers find them ready"""
+    guests = [job.guest for job in jobs if job.kind in BADGE_JOBS and job.guest is not None]
+    if len(guests) > 1:
+        render_stale(guests)
+
+
+def run_pending(limit=10):
+    """Claim and run one batch of due jobs; returns how many were run"""
+    jobs = claim(limit)
+    # Any badge that failed to render here is retried by its handler, with the job's retry policy
+    prerender(jobs)
+    for job in jobs:
+        run(job)
+    return len(jobs)
+
+
+# ---------------------------
+# HANDLERS
+# ---------------------------
+
+@handler(Job.SEND_BADGE)
+def send_badge(job):
+    guest = job.guest
+    ensure_badge(guest)
+    with span('smtp'):
+        build_badge_email(guest).send()
+
+    guest.badge_status = Guest.BADGE_SENT
+    guest.emailed_at = timezone.now()
+    guest.save(update_fields=['badge_status', 'emailed_at'])
+
+
+def _send_badge_failed(job):
+    guest = job.guest
+    guest.badge_status = Guest.BADGE_FAILED
+    guest.save(update_fields=['badge_status'])
+
+send_badge.on_failure = _send_badge_failed
+
+
+@handler(Job.RENDER_BADGE)
+def render_badge(job):
+    guest = job.guest
+    ensure_badge(guest)
+    if guest.badge_status == Guest.BADGE_PENDING:
+        guest.badge_status = Guest.BADGE_READY
+        guest.save(update_fields=['badge_status'])
+
+
+render_badge.on_failure = _send_badge_failed
+
+
+@handler(Job.IMPORT_GUESTS)
+def import_guests(job):
+    guest_import = GuestImport.objects.get(pk=job.payload['import_id'])
+    if guest_import.finished:
+        return
+
+    def heartbeat():
+        # Keep requeue_stale() from handing a long import to a second worker
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now())
+
+    run_import(guest_import, heartbeat=heartbeat)
+
+
+def _import_failed(job):
+    GuestImport.objects.filter(pk=job.payload.get('import_id')).update(
+        status=GuestImport.FAILED,
+        error=job.last_error.strip().splitlines()[-1] if job.last_error.strip() else 'Import failed',
+        finished_at=timezone.now(),
+    )
+
+import_guests.on_failure = _import_failed
@@ -0,0 +1,122 @@
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .badges import ensure_badge
+from . import stats
+from .caching import guests_changed
+from .metrics import span
+from .models import Guest
+
+
+BADGE_SUBJECT = "Class of 2016 Homecoming Registration Confirmation"
+
+
+def build_badge_email(guest, connection=None):
+    """Confirmation email for `guest` with their QR badge attached"""
+    message = f"""
+        Hello {guest.full_name},
+
+        Thank you for registering.
+
+        Your QR code is attached to this email.
+        Please keep it safe as it will be required for check-in.
+
+        Regards,
+        Reunion Committee
+        """
+
+    email = EmailMessage(
+        BADGE_SUBJECT,
+        message,
+        settings.EMAIL_HOST_USER,
+        [guest.email],
+        connection=connection,
+    )
+    email.attach_file(guest.qr_image.path)
+    return email
+
+
+class BulkSendError(Exception):
+    """A bulk send stopped part-way; `last_id` is the last guest whose email went out"""
+
+    def __init__(self, message, last_id, sent):
+        super().__init__(message)
+        self.last_id = last_id
+        self.sent = sent
+
+
+class RateLimiter:
+    """Spaces calls so no more than `rate` happen per second (0 disables)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+def send_bulk(guests, batch_size=None, rate=None, after_id=None, progress=None):
+    """
+    Email badges to `guests` in primary-key order, one SMTP connection per batch.
+
+    Each guest is stamped with `emailed_at` once their message is accepted, so a
+    run that dies part-way can be resumed with `after_id` (or by re-targeting
+    guests that have not been emailed) without re-sending.
+    """
+    batch_size = batch_size or settings.BULK_EMAIL_BATCH_SIZE
+    rate = settings.BULK_EMAIL_RATE if rate is None else rate
+    limiter = RateLimiter(rate)
+
+    total_sent = 0
+    last_id = after_id or 0
+    while True:
+        # Keyset pagination keeps each page query cheap and the order stable
+        batch = list(guests.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+        if not batch:
+            break
+        total_sent, last_id = _send_batch(batch, limiter, total_sent, last_id)
+        if progress:
+            progress(total_sent, last_id)
+    return total_sent
+
+
+def _send_batch(batch, limiter, total_sent, last_id):
+    sent_ids = []
+    connection = get_connection()
+    try:
+        with span('smtp'):
+            connection.open()
+        for guest in batch:
+            ensure_badge(guest)
+            limiter.wait()
+            with span('smtp'):
+                connection.send_messages([build_badge_email(guest, connection=connection)])
+            sent_ids.append(guest.pk)
+            last_id = guest.pk
+    except Exception as e:
+        raise BulkSendError(str(e), last_id, total_sent + len(sent_ids)) from e
+    finally:
+        connection.close()
+        if sent_ids:
+            now = timezone.now()
+            with transaction.atomic():
+                Guest.objects.filter(pk__in=sent_ids).update(
+                    emailed_at=now, badge_status=Guest.BADGE_SENT, updated_at=now,
+                )
+                stats.record(
+                    ({'badge_status': guest.badge_status}, {'badge_status': Guest.BADGE_SENT})
+                    for guest in batch if guest.pk in sent_ids
+                )
+            guests_changed(guest.qr_code_value for guest in batch if guest.pk in sent_ids)
+    return total_sent + len(sent_ids), last_id
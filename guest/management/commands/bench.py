@@ -0,0 +1,720 @@
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from PIL import Image
+
+from guest import badges, exports, readers, rendering, search, spreadsheets, stats
+
+
+def _legacy_make_qr_image(code):
+    """QR as it was before matrix rendering: full-size PIL factory image, RGBA, then shrunk"""
+    import qrcode
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H)
+    qr.add_data(code)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGBA")
+    qr_width, qr_height = qr_img.size
+    return qr_img.resize((qr_width // badges.QR_FACTOR, qr_height // badges.QR_FACTOR))
+
+
+def _legacy_render_badge(code):
+    """Badge rendering as it was before the logo template cache: decode the logo per call"""
+    qr_img = _legacy_make_qr_image(code)
+    logo = Image.open(badges.LOGO_PATH).convert("RGBA")
+    position = (badges.QR_MARGIN, logo.height - qr_img.height - badges.QR_MARGIN)
+    logo.paste(qr_img, position, qr_img)
+    buffer = BytesIO()
+    logo.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _timed(func, codes):
+    start = time.perf_counter()
+    for code in codes:
+        func(code)
+    return time.perf_counter() - start
+
+
+def bench_badges(command, options):
+    count = options["count"]
+    codes = [f"B{i:07d}" for i in range(count)]
+
+    # Warm both paths so one-off import/decoder setup is not counted
+    _legacy_render_badge(codes[0])
+    rendering.render_badge(codes[0])
+
+    before = _timed(_legacy_render_badge, codes)
+    after = _timed(rendering.render_badge, codes)
+
+    command.stdout.write(f"badges: {count} renders")
+    command.stdout.write(f"  before (decode logo per badge): {before / count * 1000:.2f} ms/badge")
+    command.stdout.write(f"  after (cached logo template):   {after / count * 1000:.2f} ms/badge")
+    command.stdout.write(f"  speedup: {before / after:.2f}x")
+
+
+def bench_qr(command, options):
+    count = options["count"]
+    codes = [f"Q{i:07d}" for i in range(count)]
+
+    # Correctness (the badge decodes to the encoded modules) is covered by guest.tests.test_rendering
+    command.stdout.write(f"qr: {count} codes")
+    _legacy_make_qr_image(codes[0])
+    rendering.make_qr_image(codes[0])
+    before = _timed(_legacy_make_qr_image, codes)
+    after = _timed(rendering.make_qr_image, codes)
+    command.stdout.write(f"  before (factory image, RGBA, shrink): {before / count * 1000:.2f} ms/QR")
+    command.stdout.write(f"  after (module matrix, NEAREST):       {after / count * 1000:.2f} ms/QR")
+    command.stdout.write(f"  speedup: {before / after:.2f}x")
+
+    badge = rendering.render_badge_image(codes[0])
+    for level, optimize, palette in ((1, False, False), (6, False, False), (9, True, False), (6, False, True)):
+        with override_settings(BADGE_PNG_COMPRESS_LEVEL=level, BADGE_PNG_OPTIMIZE=optimize, BADGE_PNG_PALETTE=palette):
+            start = time.perf_counter()
+            for _ in range(5):
+                png = rendering.encode_png(badge)
+            elapsed = (time.perf_counter() - start) / 5
+        command.stdout.write(
+            f"  png level={level} optimize={optimize!s:<5} palette={palette!s:<5}: "
+            f"{len(png) / 1024:.0f} KB in {elapsed * 1000:.1f} ms"
+        )
+
+
+def bench_render_pool(command, options):
+    from guest import render_pool
+
+    count = options["count"] * 4
+    codes = [f"P{i:07d}" for i in range(count)]
+    cpus = os.cpu_count() or 1
+    sizes = sorted({1, 2, cpus // 2, cpus} - {0})
+
+    baseline = None
+    for workers in sizes:
+        if workers > 1:
+            # Start the pool and load the logo in every worker before timing
+            list(render_pool.render_many(codes[:workers * 2], workers))
+        start = time.perf_counter()
+        errors = sum(1 for _, _, error in render_pool.render_many(codes, workers) if error)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        command.stdout.write(
+            f"render-pool: {workers:>2} worker(s), {count} badges in {elapsed:.2f}s "
+            f"({count / elapsed:.0f}/s, {baseline / elapsed:.2f}x){f', {errors} error(s)' if errors else ''}"
+        )
+    render_pool.shutdown()
+    if cpus == 1:
+        command.stdout.write("  only one CPU available; run on a multi-core machine to see scaling")
+
+
+def _write_csv(path, rows, start=0):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Full Name", "Email", "Phone Number"])
+        for i in range(start, start + rows):
+            writer.writerow([f"Guest {i}", f"guest{i}@example.com", f"0800{i:07d}"])
+
+
+def _write_xlsx(path, rows, start=0):
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Guests")
+    ws.append(["Full Name", "Email", "Phone Number"])
+    for i in range(start, start + rows):
+        ws.append([f"Guest {i}", f"guest{i}@example.com", f"0800{i:07d}"])
+    wb.save(path)
+
+
+def _peak_reading(path, batch_size):
+    """Peak traced memory while streaming `path` through the reader in importer-sized batches"""
+    tracemalloc.start()
+    count = 0
+    with open(path, "rb") as f:
+        batch = []
+        for row in readers.iter_rows(f):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count += len(batch)
+                batch = []
+        count += len(batch)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, peak
+
+
+def bench_import_memory(command, options):
+    from guest.importer import IMPORT_CHUNK_SIZE
+
+    sizes = [options["rows"] // 10, options["rows"]]
+    with tempfile.TemporaryDirectory() as tmp:
+        for ext, writer in ((".csv", _write_csv), (".xlsx", _write_xlsx)):
+            peaks = []
+            for size in sizes:
+                path = os.path.join(tmp, f"guests_{size}{ext}")
+                writer(path, size)
+                count, peak = _peak_reading(path, IMPORT_CHUNK_SIZE)
+                peaks.append(peak)
+                command.stdout.write(
+                    f"import-memory{ext}: {count} rows, {os.path.getsize(path) / 1e6:.1f} MB file, "
+                    f"peak {peak / 1e6:.2f} MB"
+                )
+            command.stdout.write(f"  peak growth for {sizes[1] // sizes[0]}x rows: {peaks[1] / peaks[0]:.2f}x")
+
+
+def _synthetic_rows(count):
+    for i in range(count):
+        yield (f"Guest {i}", f"guest{i}@example.com", f"0800{i:07d}", f"C{i:07d}")
+
+
+def _legacy_write_xlsx(rows):
+    """XLSX export as it was before the write-only service: full workbook, fill rebuilt per row"""
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Guests"
+    for column, width in exports.XLSX_COLUMN_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+    ws.append(exports.EXPORT_HEADERS)
+    for cell in ws[1]:
+        cell.fill = PatternFill(start_color="0D6EFD", end_color="0D6EFD", fill_type="solid")
+        cell.font = Font(bold=True, color="FFFFFF", size=12)
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    for idx, row in enumerate(rows, start=2):
+        ws.append(row)
+        if idx % 2 == 0:
+            fill = PatternFill(start_color="F8F9FA", end_color="F8F9FA", fill_type="solid")
+            for cell in ws[idx]:
+                cell.fill = fill
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer
+
+
+def _export_case(writer_name, count):
+    """Runs in a fresh child process so ru_maxrss is the peak of this case alone"""
+    writer = _legacy_write_xlsx if writer_name == "before" else spreadsheets.write_xlsx
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    writer(_synthetic_rows(count)).close()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, baseline, peak
+
+
+def bench_export_xlsx(command, options):
+    for count in (options["rows"] // 10, options["rows"]):
+        for writer_name in ("before", "after"):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, baseline, peak = pool.submit(_export_case, writer_name, count).result()
+            command.stdout.write(
+                f"export-xlsx {writer_name:>6}: {count} rows in {elapsed:.2f}s, "
+                f"peak RSS {peak / 1024:.0f} MB (+{(peak - baseline) / 1024:.0f} MB)"
+            )
+
+
+@contextmanager
+def _test_database():
+    """Run against a throwaway test database so benchmarks never touch real guests"""
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    search._backend = None
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        search._backend = None
+
+
+def seed_guests(count, batch_size=5000):
+    from guest.models import Guest
+
+    for start in range(0, count, batch_size):
+        guests = []
+        for i in range(start, min(start + batch_size, count)):
+            guest = Guest(
+                full_name=f"Guest {i} Surname{i % 997}",
+                email=f"guest{i}@example{i % 50}.com",
+                phone_number=f"0800{i:07d}",
+                qr_code_value=f"{i:08X}",
+            )
+            guest.normalize()
+            guests.append(guest)
+        Guest.objects.bulk_create(guests)
+    # bulk_create skips the signals that keep the dashboard statistics current
+    stats.reconcile()
+
+
+def bench_search(command, options):
+    from guest.models import Guest
+
+    terms = ["Surname42", "guest9999@", "0800001234", "000012AB", "zzz-no-match"]
+    repeats = max(options["count"] // 5, 1)
+    with _test_database():
+        seed_guests(options["rows"])
+        backends = [search.LikeSearch(), search.get_search_backend()]
+        for backend in backends:
+            for term in terms:
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    matches = backend.filter(Guest.objects.all(), term).count()
+                elapsed = (time.perf_counter() - start) / repeats
+                command.stdout.write(
+                    f"search {backend.name:>7}: {term!r:>16} -> {matches} match(es) "
+                    f"in {elapsed * 1000:.2f} ms ({options['rows']} guests)"
+                )
+
+
+def bench_codes(command, options):
+    from guest.codes import CodeAllocator
+
+    count = options["rows"] * 10
+    with _test_database():
+        seed_guests(options["rows"])
+        allocator = CodeAllocator()
+        start = time.perf_counter()
+        codes = []
+        # Importer-sized requests, as a big import would make them
+        while len(codes) < count:
+            codes.extend(allocator.take_many(min(500, count - len(codes))))
+        elapsed = time.perf_counter() - start
+    # Uniqueness against existing guests is covered by guest.tests.test_codes
+    command.stdout.write(
+        f"codes: {count} codes in {elapsed:.2f}s ({count / elapsed:,.0f}/s), "
+        f"{allocator.queries} verification queries against {options['rows']} guests"
+    )
+
+
+def _writer(worker, count):
+    """Register guests and check them in, as the registration form and door scanners do together"""
+    from django.db import OperationalError, connections, transaction
+    from guest.checkin import check_in
+    from guest.jobs import enqueue
+    from guest.models import Guest, Job
+
+    errors, latencies = Counter(), []
+    try:
+        for i in range(count):
+            start = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    guest = Guest.objects.create(
+                        full_name=f"Writer {worker} Guest {i}",
+                        email=f"w{worker}-{i}@example.com",
+                        phone_number=f"0700{worker:03d}{i:04d}",
+                    )
+                    enqueue(Job.SEND_BADGE, guest=guest)
+                check_in(guest.qr_code_value)
+            except OperationalError as e:
+                errors[str(e)] += 1
+            latencies.append(time.perf_counter() - start)
+    finally:
+        # This thread's connections only
+        connections.close_all()
+    return errors, latencies
+
+
+def _concurrent_writes(command, label, writers, per_writer):
+    from guest.management.commands.loadtest import percentile
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        outcomes = list(pool.map(_writer, range(writers), [per_writer] * writers))
+    elapsed = time.perf_counter() - start
+
+    errors = sum((e for e, _ in outcomes), Counter())
+    latencies = [seconds for _, worker_latencies in outcomes for seconds in worker_latencies]
+    total = writers * per_writer
+    command.stdout.write(
+        f"concurrency {label}: {writers} writers x {per_writer} in {elapsed:.2f}s "
+        f"({(total - sum(errors.values())) / elapsed:.0f} ok/s), "
+        f"p50 {percentile(latencies, 50) * 1000:.1f} ms, p95 {percentile(latencies, 95) * 1000:.1f} ms, "
+        f"errors {sum(errors.values())}"
+    )
+    for message, count in errors.most_common(3):
+        command.stdout.write(f"  {count} x {message}")
+
+
+def bench_concurrency(command, options):
+    writers = 16
+    per_writer = max(options["count"], 1)
+    if connection.vendor != "sqlite":
+        with _test_database():
+            _concurrent_writes(command, connection.vendor, writers, per_writer)
+        return
+
+    profiles = [
+        # Rollback journal with deferred transactions, as before WAL tuning
+        ("sqlite default", {"journal_mode": "DELETE"}, "DEFERRED"),
+        ("sqlite tuned", None, "IMMEDIATE"),
+    ]
+    options_before = dict(connection.settings_dict.get("OPTIONS", {}))
+    test_before = dict(connection.settings_dict.get("TEST", {}))
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, pragmas, mode in profiles:
+            # A real file: the default in-memory test database has no journal to contend on
+            connection.settings_dict["TEST"] = {**test_before, "NAME": os.path.join(tmp, f"{mode}.sqlite3")}
+            connection.settings_dict["OPTIONS"] = {**options_before, "transaction_mode": mode}
+            try:
+                with override_settings(**({"SQLITE_PRAGMAS": pragmas} if pragmas is not None else {})):
+                    with _test_database():
+                        _concurrent_writes(command, label, writers, per_writer)
+            finally:
+                connection.settings_dict["OPTIONS"] = options_before
+                connection.settings_dict["TEST"] = test_before
+
+
+# ---------------------------
+# REQUEST PATHS
+# ---------------------------
+
+IMPORT_SIZES = (1000, 10000)
+
+
+def measure(command, name, func, iterations, setup=None, **info):
+    """
+    Call func(i) `iterations` times, timing each call and counting its SQL
+    queries, then once more under tracemalloc for peak memory (tracing slows
+    Python down, so it stays out of the timed calls). `setup(i)` runs before
+    each call, untimed. The result is printed and kept for --json.
+    """
+    latencies, queries = [], 0
+    for i in range(iterations):
+        if setup:
+            setup(i)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func(i)
+            latencies.append(time.perf_counter() - start)
+        queries += len(captured)
+
+    if setup:
+        setup(iterations)
+    tracemalloc.start()
+    try:
+        func(iterations)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    from guest.management.commands.loadtest import percentile
+
+    elapsed = sum(latencies)
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "seconds": round(elapsed, 4),
+        "per_second": round(iterations / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "queries_per_call": round(queries / iterations, 1),
+        "peak_memory_mb": round(peak / 1e6, 2),
+        **info,
+    }
+    command.results.append(result)
+    command.stdout.write(
+        f"{name}: {iterations} calls in {elapsed:.2f}s ({result['per_second']:,.1f}/s), "
+        f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+        f"{result['queries_per_call']:g} queries/call, peak {result['peak_memory_mb']:.2f} MB"
+    )
+    return result
+
+
+@contextmanager
+def _request_environment(guests):
+    """
+    A seeded test database, locmem email, a throwaway MEDIA_ROOT and an empty
+    cache, so the request paths run end to end without side effects.
+    """
+    caches_config = settings.CACHES
+    if caches_config["pages"]["BACKEND"].endswith("DummyCache"):
+        # Everything runs in this one process, so a per-process page cache stays coherent here
+        caches_config = {**caches_config, "pages": caches_config["default"]}
+    with (
+        tempfile.TemporaryDirectory() as media_root,
+        override_settings(MEDIA_ROOT=media_root, CACHES=caches_config),
+        _test_database(),
+    ):
+        setup_test_environment()
+        cache.clear()
+        try:
+            seed_guests(guests)
+            yield Client()
+        finally:
+            teardown_test_environment()
+            cache.clear()
+
+
+def _body_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _expect(response, status, name):
+    """Stop rather than time an error page; what the responses contain is checked in guest.tests.test_requests"""
+    if response.status_code != status:
+        raise CommandError(f"{name}: expected HTTP {status}, got {response.status_code}")
+    return response
+
+
+def bench_register(command, options):
+    from guest import jobs
+
+    iterations = options["count"]
+    with _request_environment(options["guests"]) as client:
+        def post(i):
+            _expect(client.post("/", {
+                "full_name": f"Bench Guest {i}",
+                "email": f"bench{i}@example.org",
+                "phone_number": f"0900{i:07d}",
+            }, REMOTE_ADDR=f"10.0.{i // 250}.{i % 250}"), 302, "register")
+
+        measure(command, "register", post, iterations, guests=options["guests"])
+        # The other half of a registration: the worker renders the badge and sends the email
+        measure(command, "register worker", lambda i: jobs.run_pending(limit=1), iterations, guests=options["guests"])
+
+
+def bench_import(command, options):
+    from guest import jobs
+    from guest.models import Job
+
+    iterations = max(options["count"] // 25, 1)
+    formats = [(".csv", _write_csv)]
+    if exports.HAS_OPENPYXL:
+        formats.append((".xlsx", _write_xlsx))
+
+    def clear_render_jobs(i):
+        # Imported guests queue badge renders; keep them from being claimed ahead of the next import
+        Job.objects.filter(kind=Job.RENDER_BADGE).delete()
+
+    offset = 0
+    with tempfile.TemporaryDirectory() as tmp, _request_environment(options["guests"]) as client:
+        for size in IMPORT_SIZES:
+            for ext, writer in formats:
+                # A fresh file per call, with rows no earlier call imported
+                paths = []
+                for i in range(iterations + 1):
+                    paths.append(os.path.join(tmp, f"guests_{size}_{i}{ext}"))
+                    writer(paths[-1], size, start=offset)
+                    offset += size
+
+                def upload_and_run(i):
+                    with open(paths[i], "rb") as f:
+                        _expect(client.post("/import/", {"file": f}), 302, "import")
+                    jobs.run_pending(limit=1)
+
+                result = measure(command, f"import {size}{ext}", upload_and_run, iterations, setup=clear_render_jobs, rows=size)
+                command.stdout.write(f"  {size * result['per_second']:,.0f} rows/s")
+
+
+def bench_export(command, options):
+    iterations = max(options["count"] // 10, 1)
+    with _request_environment(options["guests"]) as client:
+        for url in ("/export/csv/", "/export/xlsx/"):
+            if url.endswith("xlsx/") and not exports.HAS_OPENPYXL:
+                continue
+            sizes = []
+            measure(
+                command, f"export {url.strip('/').split('/')[-1]}",
+                lambda i: sizes.append(_body_size(_expect(client.get(url), 200, url))),
+                iterations, guests=options["guests"],
+            )
+            command.stdout.write(f"  {sizes[-1] / 1e6:.1f} MB per export")
+
+
+def bench_dashboard(command, options):
+    iterations = options["count"]
+    with _request_environment(options["guests"]) as client:
+        def load(i):
+            _expect(client.get("/dashboard/"), 200, "dashboard")
+            _expect(client.get("/dashboard/data/", {"draw": i, "start": (i % 20) * 25, "length": 25}), 200, "dashboard data")
+
+        measure(command, "dashboard cold", load, iterations, setup=lambda i: cache.clear(), guests=options["guests"])
+        measure(command, "dashboard warm", load, iterations, guests=options["guests"])
+
+
+def bench_success(command, options):
+    from guest.models import Guest
+
+    iterations = options["count"]
+    with _request_environment(options["guests"]) as client:
+        codes = list(Guest.objects.order_by("?").values_list("qr_code_value", flat=True)[:iterations + 1])
+        # A different guest per call: every lookup misses the page cache
+        measure(
+            command, "success cold",
+            lambda i: _expect(client.get(f"/success/{codes[i]}/"), 200, "success"),
+            iterations, guests=options["guests"],
+        )
+        measure(
+            command, "success warm",
+            lambda i: _expect(client.get(f"/success/{codes[0]}/"), 200, "success"),
+            iterations, guests=options["guests"],
+        )
+
+
+# ---------------------------
+# STARTUP
+# ---------------------------
+
+HEAVY_MODULES = ("PIL.Image", "qrcode", "openpyxl")
+
+# Run in a fresh interpreter: what a gunicorn worker (or manage.py) pays before serving anything
+STARTUP_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import core.wsgi
+wsgi = time.perf_counter() - start
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    "wsgi": wsgi,
+    "urls": time.perf_counter() - start,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+# Fork a worker after loading the app, with or without GUNICORN_PRELOAD's warm-up in the parent,
+# let it load the heavy modules as its first badge or spreadsheet would, and report its private memory
+PRELOAD_PROBE = """
+import json, os, sys
+import core.wsgi
+from guest.startup import preload, preload_modules
+
+def private_kb():
+    with open("/proc/self/smaps_rollup") as f:
+        return sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean", "Private_Dirty")))
+
+if sys.argv[1] == "preload":
+    preload()
+read, write = os.pipe()
+pid = os.fork()
+if pid == 0:
+    before = private_kb()
+    preload_modules()
+    os.write(write, json.dumps({"private_kb": private_kb(), "forked_kb": before}).encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+print(os.read(read, 4096).decode())
+"""
+
+
+def _probe(script, *args):
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings")}
+    completed = subprocess.run(
+        [sys.executable, "-c", script, *args], capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+    )
+    if completed.returncode:
+        raise CommandError(f"startup probe failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(command, options):
+    from guest.management.commands.loadtest import percentile
+
+    runs = [_probe(STARTUP_PROBE) for _ in range(max(options["count"] // 10, 3))]
+    for stage in ("wsgi", "urls"):
+        seconds = [run[stage] for run in runs]
+        label = "import core.wsgi" if stage == "wsgi" else "  + URLconf and views"
+        command.stdout.write(
+            f"startup {label}: p50 {percentile(seconds, 50) * 1000:.0f} ms, "
+            f"p95 {percentile(seconds, 95) * 1000:.0f} ms ({len(runs)} fresh processes)"
+        )
+    rss = percentile([run["rss_kb"] for run in runs], 50) / 1024
+    command.stdout.write(f"  peak RSS {rss:.1f} MB, heavy modules loaded: {', '.join(runs[0]['heavy']) or 'none'}")
+    command.results.append({
+        "name": "startup",
+        "iterations": len(runs),
+        "wsgi_p50_ms": round(percentile([run["wsgi"] for run in runs], 50) * 1000, 1),
+        "urls_p50_ms": round(percentile([run["urls"] for run in runs], 50) * 1000, 1),
+        "rss_mb": round(rss, 1),
+        "heavy_modules": runs[0]["heavy"],
+    })
+
+    if not os.path.exists("/proc/self/smaps_rollup") or not hasattr(os, "fork"):
+        command.stdout.write("  per-worker private memory needs Linux; skipped")
+        return
+    for mode in ("lazy", "preload"):
+        worker = _probe(PRELOAD_PROBE, mode)
+        command.stdout.write(
+            f"startup worker ({mode}): {worker['private_kb'] / 1024:.1f} MB private after loading "
+            f"rendering and spreadsheets ({worker['forked_kb'] / 1024:.1f} MB at fork)"
+        )
+        command.results.append({"name": f"startup worker {mode}", "private_mb": round(worker["private_kb"] / 1024, 1)})
+
+
+TARGETS = {
+    "register": bench_register,
+    "import": bench_import,
+    "export": bench_export,
+    "dashboard": bench_dashboard,
+    "success": bench_success,
+    "startup": bench_startup,
+    "badges": bench_badges,
+    "render-pool": bench_render_pool,
+    "qr": bench_qr,
+    "codes": bench_codes,
+    "concurrency": bench_concurrency,
+    "import-memory": bench_import_memory,
+    "export-xlsx": bench_export_xlsx,
+    "search": bench_search,
+}
+
+
+class Command(BaseCommand):
+    help = "Run performance benchmarks for the guest app"
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="*", help=f"Benchmarks to run ({', '.join(TARGETS)}); default all")
+        parser.add_argument("--count", type=int, default=50, help="Iterations per benchmark")
+        parser.add_argument("--rows", type=int, default=100000, help="Rows in generated import/export files")
+        parser.add_argument("--guests", type=int, default=10000, help="Guests seeded for the request path benchmarks")
+        parser.add_argument("--json", metavar="PATH", help="Also write the request path results to PATH as JSON")
+
+    def handle(self, *args, **options):
+        targets = options["targets"] or list(TARGETS)
+        unknown = [t for t in targets if t not in TARGETS]
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+        self.results = []
+        for target in targets:
+            TARGETS[target](self, options)
+
+        if options["json"]:
+            report = {
+                "created": timezone.now().isoformat(),
+                "targets": targets,
+                "environment": {
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "database": connection.vendor,
+                    "cpus": os.cpu_count(),
+                },
+                "results": self.results,
+            }
+            with open(options["json"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {len(self.results)} result(s) to {options['json']}")
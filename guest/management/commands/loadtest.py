@@ -0,0 +1,167 @@
+import json
+import random
+import re
+import statistics
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from guest.models import Guest
+
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _request(url, data=None, timeout=10, headers=None):
+    """Returns (status, body, seconds); network errors come back as status 0"""
+    request = Request(url, data=data, method="POST" if data is not None else "GET", headers=headers or {})
+    start = time.perf_counter()
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except HTTPError as e:
+        body = e.read()
+        status = e.code
+    except URLError as e:
+        body = str(e.reason).encode()
+        status = 0
+    return status, body, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = "Drive concurrent requests at a running server and report throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=["checkin", "register", "success"], help="What to load")
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the running server")
+        parser.add_argument("--concurrency", type=int, default=8, help="Simultaneous clients (e.g. door scanners)")
+        parser.add_argument("--guests", type=int, default=200, help="Distinct guest codes to scan")
+        parser.add_argument(
+            "--repeat", type=int, default=3,
+            help="Times each code is scanned or form submitted, to exercise double scans and double submits",
+        )
+        parser.add_argument("--requests", type=int, default=500, help="Total requests for the register/success scenarios")
+        parser.add_argument("--token", default=settings.CHECKIN_TOKEN, help="Scanner token for checkin (default CHECKIN_TOKEN)")
+
+    def handle(self, *args, **options):
+        handler = getattr(self, f"scenario_{options['scenario']}")
+        handler(options)
+
+    def run_concurrently(self, func, items, concurrency):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(func, items))
+        return results, time.perf_counter() - start
+
+    def report(self, name, results, elapsed):
+        latencies = [seconds for _, _, seconds in results]
+        statuses = Counter(status for status, _, _ in results)
+        self.stdout.write(f"{name}: {len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s)")
+        self.stdout.write(
+            f"  latency ms: mean {statistics.mean(latencies) * 1000:.2f}, "
+            f"p50 {percentile(latencies, 50) * 1000:.2f}, p95 {percentile(latencies, 95) * 1000:.2f}, "
+            f"p99 {percentile(latencies, 99) * 1000:.2f}, max {max(latencies) * 1000:.2f}"
+        )
+        self.stdout.write(f"  status codes: {dict(sorted(statuses.items()))}")
+
+    def scenario_checkin(self, options):
+        """Scan codes from the database (the server must use the same one) from several scanners at once"""
+        codes = list(
+            Guest.objects.filter(checked_in_at__isnull=True)
+            .values_list("qr_code_value", flat=True)[:options["guests"]]
+        )
+        if not codes:
+            raise CommandError("No guests left to check in; seed or import some first")
+        scans = codes * options["repeat"]
+        random.shuffle(scans)
+        base = options["url"].rstrip("/")
+        headers = {"Authorization": f"Bearer {options['token']}"}
+
+        def scan(code):
+            status, body, seconds = _request(f"{base}/checkin/{code}/", data=b"", headers=headers)
+            return code, (status, body, seconds)
+
+        outcomes, elapsed = self.run_concurrently(scan, scans, options["concurrency"])
+
+        self.report("checkin", [result for _, result in outcomes], elapsed)
+
+        admissions = Counter()
+        for code, (status, body, _) in outcomes:
+            if status == 200 and not json.loads(body)["already_checked_in"]:
+                admissions[code] += 1
+        double = sum(1 for count in admissions.values() if count > 1)
+        self.stdout.write(f"  guests admitted: {len(admissions)} of {len(codes)}, double admissions: {double}")
+
+    def scenario_register(self, options):
+        """
+        Submit the registration form, each form --repeat times at once as a
+        double-click or retry would; the redirect to the success page is
+        followed as a browser would. The server must use this database, and
+        RATELIMIT_REGISTER_PER_IP='' unless the 429s are what's being tested.
+        """
+        base = options["url"].rstrip("/")
+        try:
+            with urlopen(f"{base}/", timeout=10) as response:
+                token = CSRF_INPUT.search(response.read().decode())
+                cookies = SimpleCookie()
+                for header in response.headers.get_all("Set-Cookie") or []:
+                    cookies.load(header)
+        except (HTTPError, URLError) as e:
+            raise CommandError(f"Could not load the registration form from {base}/: {e}")
+        if token is None or "csrftoken" not in cookies:
+            raise CommandError(f"No CSRF token on the registration form at {base}/")
+        # One form token and cookie pair is valid for any number of submissions
+        csrf_token = token.group(1)
+        headers = {"Cookie": f"csrftoken={cookies['csrftoken'].value}", "Referer": f"{base}/"}
+        run = uuid.uuid4().hex[:8]
+
+        repeat = max(options["repeat"], 1)
+        forms = [(i, uuid.uuid4().hex) for i in range(-(-options["requests"] // repeat))]
+        # Copies of a form are adjacent, so they are in flight together
+        submissions = [form for form in forms for _ in range(repeat)][:options["requests"]]
+
+        def submit(form):
+            i, registration_token = form
+            data = urlencode({
+                "csrfmiddlewaretoken": csrf_token,
+                "registration_token": registration_token,
+                "full_name": f"Load Test {run} {i}",
+                "email": f"loadtest-{run}-{i}@example.com",
+                "phone_number": f"0900{i:07d}",
+            }).encode()
+            return _request(f"{base}/", data=data, headers=headers)
+
+        results, elapsed = self.run_concurrently(submit, submissions, options["concurrency"])
+        self.report("register", results, elapsed)
+        created = Guest.objects.filter(email__startswith=f"loadtest-{run}-").count()
+        submitted = len({form for form in submissions})
+        self.stdout.write(f"  guests created: {created} for {submitted} distinct forms, duplicates: {max(created - submitted, 0)}")
+
+    def scenario_success(self, options):
+        """Load success pages for existing guests"""
+        codes = list(Guest.objects.values_list("qr_code_value", flat=True)[:options["guests"]])
+        if not codes:
+            raise CommandError("No guests to load; seed or import some first")
+        base = options["url"].rstrip("/")
+        pages = [random.choice(codes) for _ in range(options["requests"])]
+
+        results, elapsed = self.run_concurrently(
+            lambda code: _request(f"{base}/success/{code}/"), pages, options["concurrency"],
+        )
+        self.report("success", results, elapsed)
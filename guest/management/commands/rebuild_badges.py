@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from guest import render_pool
+from guest.badges import badge_key, is_stale
+from guest.models import Guest
+
+
+class Command(BaseCommand):
+    help = "Render badges that are missing or out of date (e.g. after the logo or QR settings change)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Re-render every badge, even up-to-date ones")
+        parser.add_argument("--workers", type=int, help="Render processes (default BADGE_RENDER_WORKERS, or one per CPU)")
+        parser.add_argument("--batch-size", type=int, default=200, help="Guests loaded and rendered per batch")
+        parser.add_argument("--skip-file-check", action="store_true", help="Trust badge_hash without checking storage")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many badges would be rendered")
+
+    def handle(self, *args, **options):
+        guests = Guest.objects.only("pk", "qr_code_value", "qr_image", "badge_hash", "badge_status").order_by("pk")
+        check_files = not options["skip_file_check"]
+        batch_size = options["batch_size"]
+
+        rendered = failed = checked = 0
+        last_pk = 0
+        try:
+            while True:
+                batch = list(guests.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                checked += len(batch)
+
+                if options["dry_run"]:
+                    rendered += sum(
+                        1 for guest in batch
+                        if options["force"] or is_stale(guest, badge_key(guest.qr_code_value), check_files=check_files)
+                    )
+                    continue
+
+                done, errors = render_pool.render_stale(
+                    batch, workers=options["workers"], force=options["force"], check_files=check_files,
+                )
+                rendered += done
+                failed += errors
+                if done or errors:
+                    self.stdout.write(f"Rendered {rendered} badge(s), checked {checked} guest(s)")
+        finally:
+            render_pool.shutdown()
+
+        if options["dry_run"]:
+            self.stdout.write(f"{rendered} of {checked} badge(s) would be rendered")
+            return
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} badge(s) failed to render; see the log"))
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} badge(s), {checked - rendered - failed} up to date"))
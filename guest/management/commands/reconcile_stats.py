@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from guest import stats
+
+
+class Command(BaseCommand):
+    help = "Recount the dashboard statistics from the guest rows and report any drift"
+
+    def handle(self, *args, **options):
+        drift = stats.reconcile()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Statistics match the guest rows"))
+            return
+        for name, delta in sorted(drift.items()):
+            self.stdout.write(f"  {name}: {delta:+d}")
+        self.stdout.write(self.style.WARNING(f"Corrected {len(drift)} statistic(s)"))
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from guest import jobs, render_pool, stats
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (badge rendering and email delivery)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run all due jobs and exit instead of polling")
+        parser.add_argument("--batch", type=int, default=50, help="Jobs claimed per poll; their badges render in parallel")
+        parser.add_argument("--poll", type=float, default=settings.JOB_POLL_INTERVAL, help="Seconds to sleep when idle")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker started")
+        interval = settings.STATS_RECONCILE_INTERVAL
+        next_reconcile = time.monotonic()
+        try:
+            while True:
+                close_old_connections()
+                if interval and time.monotonic() >= next_reconcile:
+                    stats.reconcile()
+                    next_reconcile = time.monotonic() + interval
+                jobs.requeue_stale()
+                ran = jobs.run_pending(options["batch"])
+                if ran:
+                    self.stdout.write(f"Processed {ran} job(s)")
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            render_pool.shutdown()
+        self.stdout.write("Worker stopped")
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from guest.mail import BulkSendError, send_bulk
+from guest.models import Guest
+
+
+class Command(BaseCommand):
+    help = "Email QR badges in batches over a shared SMTP connection"
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument("--all", action="store_true", help="Every guest, including those already emailed")
+        target.add_argument("--pending", action="store_true", help="Guests who have not been emailed (default)")
+        parser.add_argument("--ids", help="Comma-separated guest ids to restrict to")
+        parser.add_argument("--search", help="Only guests whose name or email contains this text")
+        parser.add_argument("--status", choices=[c for c, _ in Guest.BADGE_STATUS_CHOICES], help="Only guests with this badge status")
+        parser.add_argument("--batch-size", type=int, help="Messages per SMTP connection")
+        parser.add_argument("--rate", type=float, help="Maximum messages per second (0 = unlimited)")
+        parser.add_argument("--after-id", type=int, help="Resume after this guest id")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many guests would be emailed")
+
+    def handle(self, *args, **options):
+        guests = Guest.objects.all()
+        if not options["all"]:
+            # Badges sent before emailed_at existed are only marked by their status
+            guests = guests.filter(emailed_at__isnull=True).exclude(badge_status=Guest.BADGE_SENT)
+        if options["ids"]:
+            try:
+                ids = [int(i) for i in options["ids"].split(",") if i.strip()]
+            except ValueError:
+                raise CommandError("--ids must be a comma-separated list of integers")
+            guests = guests.filter(pk__in=ids)
+        if options["search"]:
+            term = options["search"]
+            guests = guests.filter(Q(full_name__icontains=term) | Q(email__icontains=term))
+        if options["status"]:
+            guests = guests.filter(badge_status=options["status"])
+
+        if options["dry_run"]:
+            self.stdout.write(f"{guests.count()} guest(s) would be emailed")
+            return
+
+        def progress(sent, last_id):
+            self.stdout.write(f"Sent {sent} so far (last guest id {last_id})")
+
+        try:
+            sent = send_bulk(
+                guests,
+                batch_size=options["batch_size"],
+                rate=options["rate"],
+                after_id=options["after_id"],
+                progress=progress,
+            )
+        except BulkSendError as e:
+            raise CommandError(
+                f"Stopped after {e.sent} email(s): {e}. "
+                f"Re-run with --after-id {e.last_id or 0} (or --pending) to resume."
+            )
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} email(s)"))
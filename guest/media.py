@@ -0,0 +1,127 @@
+import mimetypes
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .badges import BADGE_DIR, ensure_badge
+
+# Names written by store_badge(): the hash changes whenever the content does
+HASHED_NAME = re.compile(r'^(thumbs/)?(?P<code>[A-Z0-9]+)-(?P<key>[0-9a-f]{16})\.(png|webp)$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def byte_range(header, size):
+    """
+    (start, end) of a single byte range, inclusive, or None to send the whole
+    file. Raises ValueError when the range can't be satisfied.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        # Multiple or malformed ranges may be ignored (RFC 9110 14.2)
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Not a valid range-spec, so the header is ignored rather than refused
+        return None
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def restore_badge(name):
+    """
+    Render a guest's current badge files when this host doesn't have them,
+    e.g. because the worker rendered them onto its own disk. Returns whether
+    `name` exists afterwards.
+    """
+    from .models import Guest
+
+    match = HASHED_NAME.match(name)
+    if not match:
+        return False
+    guest = Guest.objects.filter(qr_code_value=match['code'], badge_hash=match['key']).first()
+    if guest is None:
+        # An unknown code or a superseded badge: nothing to rebuild
+        return False
+    ensure_badge(guest)
+    return default_storage.exists(f'{BADGE_DIR}/{name}')
+
+
+def badge_file_response(request, name):
+    """
+    Serve a badge or thumbnail from storage.
+
+    Content-hashed names are cached for a year as immutable; anything else
+    under the badge directory is revalidated. Conditional and single Range
+    requests are answered here, or the file is handed to the front-end
+    server when MEDIA_SENDFILE is set.
+    """
+    path = posixpath.normpath(f'{BADGE_DIR}/{name}')
+    if not path.startswith(f'{BADGE_DIR}/'):
+        # Other media (guest imports) is never served from here
+        raise Http404(name)
+    try:
+        if not default_storage.exists(path) and not restore_badge(name):
+            raise Http404(name)
+        size = default_storage.size(path)
+        modified = default_storage.get_modified_time(path).timestamp()
+    except SuspiciousFileOperation:
+        raise Http404(name)
+
+    hashed = HASHED_NAME.match(name)
+    etag = f'"{name.rsplit("/", 1)[-1].rsplit(".", 1)[0]}"' if hashed else f'"{int(modified)}-{size}"'
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + path
+        elif settings.MEDIA_SENDFILE == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = default_storage.path(path)
+        else:
+            response = _file_response(request, path, size, etag, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    response['Cache-Control'] = IMMUTABLE if hashed else 'public, no-cache'
+    return response
+
+
+def _file_response(request, path, size, etag, content_type):
+    if_range = request.headers.get('If-Range')
+    header = request.headers.get('Range') if not if_range or if_range == etag else None
+    try:
+        span = byte_range(header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if span is None:
+        response = FileResponse(default_storage.open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = span
+        with default_storage.open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        response = HttpResponse(data, status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
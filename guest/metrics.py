@@ -0,0 +1,163 @@
+"""
+In-process performance metrics.
+
+Request timings, SQL query counts and named spans (qr_render, smtp) are
+collected per request or job through a context variable, and aggregated into
+counters and histograms rendered in the Prometheus text format by /metrics.
+Aggregates are per process: with several gunicorn workers, each scrape sees
+the worker that answered it.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('guest_metrics', default=None)
+
+
+class Timings:
+    """What one request or job spent its time on"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.spans = defaultdict(float)
+
+
+@contextmanager
+def collect():
+    """Gather queries and spans run inside this block (including in sync_to_async threads)"""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every database connection (see guest.signals)"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.sql_seconds += time.perf_counter() - start
+
+
+@contextmanager
+def span(name):
+    """Time a named piece of work, e.g. `with span('smtp'):`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = _current.get()
+        if timings is not None:
+            timings.spans[name] += elapsed
+        SPAN_SECONDS.observe(elapsed, span=name)
+
+
+# ---------------------------
+# REGISTRY
+# ---------------------------
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] += amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(key)} {value:g}'
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label key -> [count per bucket..., +Inf count, sum]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += 1
+            row[-1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(row) for key, row in self._values.items()}
+        for key, row in sorted(values.items()):
+            for bound, count in zip(self.buckets, row):
+                yield f'{self.name}_bucket{_format_labels(key, [("le", f"{bound:g}")])} {count}'
+            yield f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {row[-2]}'
+            yield f'{self.name}_count{_format_labels(key)} {row[-2]}'
+            yield f'{self.name}_sum{_format_labels(key)} {row[-1]:.6f}'
+
+
+REQUEST_SECONDS = Histogram('reunion_http_request_duration_seconds', 'Request wall time by URL name')
+REQUESTS = Counter('reunion_http_requests_total', 'Requests by URL name, method and status')
+RESPONSE_BYTES = Counter('reunion_http_response_bytes_total', 'Response body bytes by URL name')
+DB_QUERIES = Counter('reunion_db_queries_total', 'SQL queries by URL name')
+DB_SECONDS = Counter('reunion_db_query_seconds_total', 'Time spent in SQL by URL name')
+SPAN_SECONDS = Histogram('reunion_span_duration_seconds', 'Time in named spans such as qr_render and smtp')
+
+METRICS = [REQUEST_SECONDS, REQUESTS, RESPONSE_BYTES, DB_QUERIES, DB_SECONDS, SPAN_SECONDS]
+
+
+def observe_request(view, method, status, seconds, size, timings):
+    REQUEST_SECONDS.observe(seconds, view=view)
+    REQUESTS.inc(view=view, method=method, status=status)
+    if size:
+        RESPONSE_BYTES.inc(size, view=view)
+    DB_QUERIES.inc(timings.queries, view=view)
+    DB_SECONDS.inc(timings.sql_seconds, view=view)
+
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
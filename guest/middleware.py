@@ -0,0 +1,69 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import collect, observe_request
+
+logger = logging.getLogger('guest.performance')
+
+
+class PerformanceMiddleware:
+    """
+    Time every request and report wall time, SQL query count and time,
+    response size and named spans: as a Server-Timing header, a structured log
+    line and the aggregates served by /metrics.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with collect() as timings:
+            response = self.get_response(request)
+        self.finish(request, response, start, timings)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with collect() as timings:
+            response = await self.get_response(request)
+        self.finish(request, response, start, timings)
+        return response
+
+    def finish(self, request, response, start, timings):
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if response.streaming:
+            # Streamed bodies are produced after this point; count them only when the size is known
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+
+        observe_request(view, request.method, response.status_code, elapsed, size, timings)
+
+        entries = [f'app;dur={elapsed * 1000:.1f}', f'db;dur={timings.sql_seconds * 1000:.1f};desc="{timings.queries} queries"']
+        entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.spans.items()]
+        response['Server-Timing'] = ', '.join(entries)
+
+        logger.info(json.dumps({
+            'event': 'request',
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(elapsed * 1000, 2),
+            'queries': timings.queries,
+            'sql_ms': round(timings.sql_seconds * 1000, 2),
+            'bytes': size,
+            'spans': {name: round(seconds * 1000, 2) for name, seconds in timings.spans.items()},
+        }))
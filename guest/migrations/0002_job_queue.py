@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_badges_sent(apps, schema_editor):
+    # Guests registered before the queue existed were emailed inline
+    Guest = apps.get_model('guest', 'Guest')
+    Guest.objects.exclude(qr_image='').exclude(qr_image__isnull=True).update(badge_status='sent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='badge_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_badges_sent, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('send_badge', 'Render and email badge')], max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('guest', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='guest.guest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_at'], name='guest_job_status_d23220_idx')],
+            },
+        ),
+    ]
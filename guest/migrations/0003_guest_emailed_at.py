@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0002_job_queue'),
+    ]
+
+    operations = [
+        # Left empty for badges sent before this field existed: badge_status='sent' records
+        # that they went out, and there is no real timestamp to backfill
+        migrations.AddField(
+            model_name='guest',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
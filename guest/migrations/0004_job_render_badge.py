@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0003_guest_emailed_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('send_badge', 'Render and email badge'), ('render_badge', 'Render badge')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0004_job_render_badge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:33
+
+from django.db import migrations, models
+
+from guest.models import normalize_email, normalize_phone
+from guest.search import install_search_indexes, uninstall_search_indexes
+
+
+def backfill_normalized(apps, schema_editor):
+    Guest = apps.get_model('guest', 'Guest')
+    guests = list(Guest.objects.only('id', 'email', 'phone_number'))
+    for guest in guests:
+        guest.email_normalized = normalize_email(guest.email)
+        guest.phone_normalized = normalize_phone(guest.phone_number)
+    Guest.objects.bulk_update(guests, ['email_normalized', 'phone_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0005_guest_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='email_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='guest',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+        migrations.RunPython(backfill_normalized, migrations.RunPython.noop),
+        migrations.RunPython(install_search_indexes, uninstall_search_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0006_guest_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='checked_in_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
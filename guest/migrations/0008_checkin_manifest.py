@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+from guest.search import install_search_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0007_guest_checked_in_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuestTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=8)),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='guest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        # Adding updated_at rebuilds guest_guest on SQLite, which drops the FTS triggers
+        migrations.RunPython(install_search_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:37
+
+from django.db import migrations, models
+
+from guest.search import install_search_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0008_checkin_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='badge_hash',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        # Adding badge_hash rebuilds guest_guest on SQLite, which drops the FTS triggers
+        migrations.RunPython(install_search_indexes, migrations.RunPython.noop),
+    ]
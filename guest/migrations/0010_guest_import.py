@@ -0,0 +1,48 @@
+# Generated by Django 5.2.9 on 2026-10-18 02:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0009_guest_badge_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuestImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/')),
+                ('original_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('imported', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('send_badge', 'Render and email badge'), ('render_badge', 'Render badge'), ('import_guests', 'Import guest list')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ImportRowError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_num', models.PositiveIntegerField()),
+                ('reason', models.CharField(max_length=255)),
+                ('guest_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='row_errors', to='guest.guestimport')),
+            ],
+            options={
+                'ordering': ['row_num'],
+            },
+        ),
+    ]
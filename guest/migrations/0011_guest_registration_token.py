@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+from guest.search import install_search_indexes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0010_guest_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='registration_token',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddConstraint(
+            model_name='guest',
+            constraint=models.UniqueConstraint(condition=models.Q(('registration_token', ''), _negated=True), fields=('registration_token',), name='guest_unique_registration_token'),
+        ),
+        # Both operations rebuild guest_guest on SQLite, which drops the FTS triggers
+        migrations.RunPython(install_search_indexes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.9 on 2026-10-18 03:10
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from guest.search import install_search_indexes
+
+
+def seed(apps, schema_editor):
+    """Build the statistics for existing guests, as guest.stats computed them when this migration was written"""
+    Guest = apps.get_model('guest', 'Guest')
+    StatCounter = apps.get_model('guest', 'StatCounter')
+    DailyStat = apps.get_model('guest', 'DailyStat')
+
+    guests = Guest.objects.all()
+    totals = guests.aggregate(guests=Count('pk'), checked_in=Count('checked_in_at'))
+    counters = {'guests': totals['guests'], 'checked_in': totals['checked_in']}
+    for status, count in guests.values_list('badge_status').annotate(Count('pk')).order_by():
+        counters[f'badge_{status}'] = count
+    for source, count in guests.values_list('source').annotate(Count('pk')).order_by():
+        counters[f'source_{source}'] = count
+
+    tz = timezone.get_current_timezone()
+    daily = {}
+    rollups = [
+        ('registrations', 'created_at', guests),
+        ('imported', 'created_at', guests.filter(source='import')),
+        ('check_ins', 'checked_in_at', guests.filter(checked_in_at__isnull=False)),
+    ]
+    for name, field, queryset in rollups:
+        rows = queryset.annotate(day=TruncDate(field, tzinfo=tz)).values_list('day').annotate(Count('pk')).order_by()
+        for day, count in rows:
+            daily[day, name] = count
+
+    StatCounter.objects.bulk_create([StatCounter(name=name, value=value) for name, value in counters.items()])
+    DailyStat.objects.bulk_create([DailyStat(day=day, name=name, value=value) for (day, name), value in daily.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0011_guest_registration_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='guest',
+            name='source',
+            field=models.CharField(choices=[('form', 'Registration form'), ('import', 'Import')], default='form', editable=False, max_length=10),
+        ),
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('name', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'name'), name='dailystat_unique_day_name')],
+            },
+        ),
+        # Adding source rebuilds guest_guest on SQLite, which drops the FTS triggers
+        migrations.RunPython(install_search_indexes, migrations.RunPython.noop),
+        migrations.RunPython(seed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+def copy_unfinished_uploads(apps, schema_editor):
+    """Move uploads still waiting to be imported from MEDIA_ROOT into the database"""
+    GuestImport = apps.get_model('guest', 'GuestImport')
+    for guest_import in GuestImport.objects.filter(status__in=['queued', 'running']).exclude(file=''):
+        try:
+            with guest_import.file.open('rb') as f:
+                guest_import.content = f.read()
+        except FileNotFoundError:
+            # Uploaded on another host; the worker could never have read it either
+            continue
+        guest_import.save(update_fields=['content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guest', '0012_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guestimport',
+            name='content',
+            field=models.BinaryField(default=b'', editable=False),
+        ),
+        migrations.RunPython(copy_unfinished_uploads, migrations.RunPython.noop),
+        # A default, so migrating back can restore the column
+        migrations.AlterField(
+            model_name='guestimport',
+            name='file',
+            field=models.FileField(blank=True, default='', upload_to='imports/'),
+        ),
+        migrations.RemoveField(
+            model_name='guestimport',
+            name='file',
+        ),
+    ]
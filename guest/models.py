@@ -1,16 +1,227 @@
 from django.db import models
-import random
-import string
+from django.utils import timezone
 
 def generate_code():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    # Imported here because the allocator queries Guest
+    from .codes import allocator
+    return allocator.take()
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+def normalize_phone(phone_number):
+    return ''.join(ch for ch in (phone_number or '') if ch.isdigit())
 
 class Guest(models.Model):
+    BADGE_PENDING = 'pending'
+    BADGE_READY = 'ready'
+    BADGE_SENT = 'sent'
+    BADGE_FAILED = 'failed'
+    BADGE_STATUS_CHOICES = [
+        (BADGE_PENDING, 'Pending'),
+        (BADGE_READY, 'Ready'),
+        (BADGE_SENT, 'Sent'),
+        (BADGE_FAILED, 'Failed'),
+    ]
+
+    SOURCE_FORM = 'form'
+    SOURCE_IMPORT = 'import'
+    SOURCE_CHOICES = [
+        (SOURCE_FORM, 'Registration form'),
+        (SOURCE_IMPORT, 'Import'),
+    ]
+
     full_name = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=20)
-    email = models.EmailField()
+    email = models.EmailField(db_index=True)
     qr_code_value = models.CharField(max_length=8, unique=True, default=generate_code)
     qr_image = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
+    # badges.badge_key() of the stored image; a mismatch means the badge is stale
+    badge_hash = models.CharField(max_length=16, blank=True, default='')
+    badge_status = models.CharField(max_length=10, choices=BADGE_STATUS_CHOICES, default=BADGE_PENDING)
+    emailed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    checked_in_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Drives check-in manifest deltas; bulk .update() calls must set it themselves
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Lowercased email and digits-only phone, for exact-match duplicate checks
+    email_normalized = models.CharField(max_length=254, blank=True, db_index=True, editable=False)
+    phone_normalized = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    # Hidden token from the registration form, so a resubmitted form finds the guest it created
+    registration_token = models.CharField(max_length=32, blank=True, default='', editable=False)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default=SOURCE_FORM, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['registration_token'],
+                condition=~models.Q(registration_token=''),
+                name='guest_unique_registration_token',
+            ),
+        ]
 
     def __str__(self):
         return self.full_name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The row as loaded, so the stats signal can count what a save() changed
+        instance._loaded = dict(zip(field_names, values))
+        return instance
+
+    def normalize(self):
+        self.email_normalized = normalize_email(self.email)
+        self.phone_normalized = normalize_phone(self.phone_number)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Only normalize what this save writes: reading a deferred field costs a query
+        deferred = self.get_deferred_fields()
+        if 'email' not in deferred and (update_fields is None or 'email' in update_fields):
+            self.email_normalized = normalize_email(self.email)
+        if 'phone_number' not in deferred and (update_fields is None or 'phone_number' in update_fields):
+            self.phone_normalized = normalize_phone(self.phone_number)
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'email' in update_fields:
+                update_fields.add('email_normalized')
+            if 'phone_number' in update_fields:
+                update_fields.add('phone_normalized')
+            # auto_now is only written when listed; Last-Modified and manifests rely on it
+            update_fields.add('updated_at')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class GuestTombstone(models.Model):
+    """Code of a deleted guest, so manifest deltas can tell scanners to drop it"""
+    code = models.CharField(max_length=8)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.code
+
+
+class Job(models.Model):
+    """Background work item, claimed and run by `manage.py run_worker`"""
+    SEND_BADGE = 'send_badge'
+    RENDER_BADGE = 'render_badge'
+    IMPORT_GUESTS = 'import_guests'
+    KIND_CHOICES = [
+        (SEND_BADGE, 'Render and email badge'),
+        (RENDER_BADGE, 'Render badge'),
+        (IMPORT_GUESTS, 'Import guest list'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    guest = models.ForeignKey(Guest, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class GuestImportManager(models.Manager):
+    def get_queryset(self):
+        # The upload can run to megabytes; only run_import reads it
+        return super().get_queryset().defer('content')
+
+
+class GuestImport(models.Model):
+    """An uploaded guest list, imported by the worker in committed chunks"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # The uploaded file itself: the worker runs on another host, so it can't read the web service's disk
+    content = models.BinaryField(default=b'', editable=False)
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # Checkpoint: data rows consumed by committed chunks
+    rows_processed = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = GuestImportManager()
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def rows_per_second(self):
+        if not self.started_at:
+            return 0.0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return self.rows_processed / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.original_name} ({self.status})"
+
+
+class ImportRowError(models.Model):
+    """A row skipped by an import, for the downloadable error report"""
+    guest_import = models.ForeignKey(GuestImport, on_delete=models.CASCADE, related_name='row_errors')
+    row_num = models.PositiveIntegerField()
+    reason = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ['row_num']
+
+
+class StatCounter(models.Model):
+    """A running dashboard total, kept up to date by guest.stats"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class DailyStat(models.Model):
+    """A per-day dashboard rollup (registrations, imports, check-ins), kept up to date by guest.stats"""
+    day = models.DateField()
+    name = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'name'], name='dailystat_unique_day_name'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.name} = {self.value}"
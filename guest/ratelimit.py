@@ -0,0 +1,100 @@
+"""
+Token-bucket rate limits kept in the Django cache.
+
+Each bucket holds up to `burst` tokens and refills at `burst` per `period`
+seconds; a request spends one token or is refused. The read-modify-write is
+not atomic, so under heavy concurrency a bucket can let a few extra requests
+through. That is fine for slowing floods, which is all this is for. With the
+locmem cache the buckets are per process; point CACHE_BACKEND at redis to
+share them between workers.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'20/m' -> (20, 60); an empty rate or a zero burst disables the limit. Raises ValueError if malformed."""
+    if not rate:
+        return None
+    burst, _, period = rate.partition('/')
+    burst = int(burst)
+    if burst < 0 or (period or 's') not in PERIODS:
+        raise ValueError(f'Invalid rate {rate!r}; use "<burst>/<s|m|h|d>"')
+    if not burst:
+        return None
+    return burst, PERIODS[period or 's']
+
+
+def _key(name, value):
+    digest = hashlib.sha1(value.encode()).hexdigest()
+    return f'ratelimit:{name}:{digest}'
+
+
+def _spend(state, burst, period, now):
+    """New bucket state after one request, and the seconds to wait if it was refused"""
+    tokens, stamp = state if state else (burst, now)
+    tokens = min(burst, tokens + (now - stamp) * burst / period)
+    if tokens < 1:
+        return (tokens, now), (1 - tokens) * period / burst
+    return (tokens - 1, now), 0
+
+
+class TokenBucket:
+    def __init__(self, name, setting):
+        self.name = name
+        self.setting = setting
+
+    @property
+    def rate(self):
+        return parse_rate(getattr(settings, self.setting))
+
+    def hit(self, value, once_per=None):
+        """
+        Spend a token for `value`; returns 0 if allowed, else seconds until it
+        would be. Requests sharing a `once_per` key (resubmissions of the same
+        form) spend a single token between them.
+        """
+        rate = self.rate
+        if rate is None or not value:
+            return 0
+        if once_per and not cache.add(_key(f'{self.name}:once', once_per), True, rate[1]):
+            return 0
+        key = _key(self.name, value)
+        state, retry_after = _spend(cache.get(key), *rate, time.time())
+        cache.set(key, state, rate[1])
+        return retry_after
+
+    async def ahit(self, value, once_per=None):
+        rate = self.rate
+        if rate is None or not value:
+            return 0
+        if once_per and not await cache.aadd(_key(f'{self.name}:once', once_per), True, rate[1]):
+            return 0
+        key = _key(self.name, value)
+        state, retry_after = _spend(await cache.aget(key), *rate, time.time())
+        await cache.aset(key, state, rate[1])
+        return retry_after
+
+
+def client_ip(request):
+    """
+    The caller's address. Behind RATELIMIT_TRUSTED_PROXIES proxies it is the
+    X-Forwarded-For entry the outermost trusted proxy added; entries further
+    left are client-supplied and can be forged.
+    """
+    proxies = settings.RATELIMIT_TRUSTED_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-proxies] if len(hops) >= proxies else hops[0]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+register_per_ip = TokenBucket('register-ip', 'RATELIMIT_REGISTER_PER_IP')
+register_per_email = TokenBucket('register-email', 'RATELIMIT_REGISTER_PER_EMAIL')
+BUCKETS = (register_per_ip, register_per_email)
@@ -0,0 +1,114 @@
+import codecs
+import csv
+import io
+from importlib.util import find_spec
+
+# Checked without importing: openpyxl is only loaded for XLSX uploads
+HAS_OPENPYXL = find_spec('openpyxl') is not None
+
+
+# Bytes inspected to decide between UTF-8 and latin-1
+SNIFF_SIZE = 64 * 1024
+
+
+class ImportFileError(Exception):
+    """The upload could not be read at all (as opposed to individual bad rows)"""
+
+
+def _is_blank(values):
+    return all(v is None or str(v).strip() == '' for v in values)
+
+
+def _clean(value):
+    return str(value or '').strip()
+
+
+def sniff_encoding(file):
+    """Pick the CSV encoding from the first chunk of the upload, then rewind"""
+    head = file.read(SNIFF_SIZE)
+    file.seek(0)
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the chunk is still UTF-8
+        if e.reason != 'unexpected end of data':
+            return 'latin-1'
+    return 'utf-8'
+
+
+def iter_csv_rows(file):
+    """
+    Stream a CSV upload as (row_num, full_name, email, phone_number) tuples.
+
+    The file is decoded incrementally, so only one buffer of it is held in
+    memory at a time. The header is read eagerly so an empty or headerless
+    file raises ImportFileError before any rows are consumed.
+    """
+    encoding = sniff_encoding(file)
+    # The sniff only sees the first chunk; don't abort half an import on a stray byte later on
+    text = io.TextIOWrapper(file, encoding=encoding, errors='replace', newline='')
+    reader = csv.DictReader(text)
+    if not reader.fieldnames:
+        text.detach()
+        raise ImportFileError('CSV file appears to be empty or invalid format.')
+
+    def rows():
+        try:
+            for row_num, row in enumerate(reader, start=2):
+                if not row or _is_blank(row.values()):
+                    continue
+                yield (
+                    row_num,
+                    _clean(row.get('Full Name')),
+                    _clean(row.get('Email')),
+                    _clean(row.get('Phone Number')),
+                )
+        finally:
+            # Leave the underlying upload open for Django to clean up
+            text.detach()
+
+    return rows()
+
+
+def iter_xlsx_rows(file):
+    """Stream the first sheet of an XLSX upload; columns are name, email, phone"""
+    if not HAS_OPENPYXL:
+        raise ImportFileError('openpyxl is not installed. Cannot import XLSX files.')
+    import openpyxl
+
+    try:
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        ws = wb.active
+    except Exception as excel_error:
+        raise ImportFileError(f'Error reading Excel file: {str(excel_error)[:100]}')
+    if not ws:
+        wb.close()
+        raise ImportFileError('Excel file appears to be empty.')
+
+    def rows():
+        try:
+            for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+                if not row or _is_blank(row):
+                    continue
+                row = tuple(row) + (None,) * (3 - len(row))
+                yield (row_num, _clean(row[0]), _clean(row[1]), _clean(row[2]))
+        finally:
+            wb.close()
+
+    return rows()
+
+
+def is_supported(name):
+    return name.endswith(('.csv', '.xlsx', '.xls'))
+
+
+def iter_rows(file, name=None):
+    """Normalized row stream for an uploaded CSV or XLSX file, chosen by the extension of `name` (or file.name)"""
+    name = name or getattr(file, 'name', '') or ''
+    if name.endswith('.csv'):
+        return iter_csv_rows(file)
+    if name.endswith(('.xlsx', '.xls')):
+        return iter_xlsx_rows(file)
+    raise ImportFileError('Please upload a CSV or XLSX file.')
@@ -0,0 +1,113 @@
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .badges import badge_key, is_stale, logo_template, store_badge
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+
+
+def _init_worker():
+    # Decode the logo once per worker instead of on its first badge
+    logo_template.get()
+
+
+def default_workers():
+    return settings.BADGE_RENDER_WORKERS or os.cpu_count() or 1
+
+
+def get_pool(workers=None):
+    """Process pool for badge rendering, started on first use and reused for the life of this process"""
+    workers = workers or default_workers()
+    pool = _pools.get(workers)
+    if pool is None:
+        # spawn, not fork: children must not inherit this process's database connections
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        _pools[workers] = pool
+    return pool
+
+
+def shutdown():
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
+
+
+def render_many(codes, workers=None):
+    """
+    Render badge files for `codes` across the pool.
+
+    Yields (code, (png, png_thumbnail, webp_thumbnail), error) in the order
+    given; error is None on success. With one worker, or a single code, renders in this process.
+    """
+    from .rendering import render_badge_files
+
+    codes = list(codes)
+    workers = workers or default_workers()
+    if workers == 1 or len(codes) < 2:
+        for code in codes:
+            try:
+                yield code, render_badge_files(code), None
+            except Exception as e:
+                yield code, None, e
+        return
+
+    pool = get_pool(workers)
+    futures = deque((code, pool.submit(render_badge_files, code)) for code in codes)
+    while futures:
+        # Drop each future as it's handed over, so finished files aren't held until the last one
+        code, future = futures.popleft()
+        try:
+            yield code, future.result(), None
+        except BrokenProcessPool as e:
+            # A worker died; start a fresh pool next time
+            _pools.pop(workers, None)
+            yield code, None, e
+        except Exception as e:
+            yield code, None, e
+
+
+def render_stale(guests, workers=None, force=False, check_files=True):
+    """
+    Render and store badges for the guests whose badge is missing or out of date.
+
+    Rendering happens in the pool; files and rows are written from this process.
+    Returns (rendered, failed) counts; failures are logged and left stale.
+    """
+    stale = {}
+    for guest in guests:
+        key = badge_key(guest.qr_code_value)
+        if force or is_stale(guest, key, check_files=check_files):
+            stale[guest.qr_code_value] = (guest, key)
+    if not stale:
+        return 0, 0
+
+    rendered = failed = 0
+    results = render_many(stale, workers)
+    while True:
+        # Store each badge as it arrives, while the pool renders the rest
+        with span('qr_render'):
+            result = next(results, None)
+        if result is None:
+            break
+        code, files, error = result
+        if error is not None:
+            logger.warning("Could not render badge for %s: %s", code, error)
+            failed += 1
+            continue
+        guest, key = stale[code]
+        store_badge(guest, key, *files)
+        rendered += 1
+    return rendered, failed
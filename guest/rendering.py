@@ -0,0 +1,85 @@
+"""
+Badge pixels: the QR code, the composite onto the event logo and the PNG/WebP
+encodings.
+
+Pillow and qrcode are only imported with this module, which badges,
+render_pool and the bench command load on first render, so web workers that
+serve pages without drawing a badge never pay for them.
+"""
+from io import BytesIO
+
+import qrcode
+from PIL import Image
+from django.conf import settings
+
+from .badges import QR_BOX_SIZE, QR_FACTOR, QR_MARGIN, THUMBNAIL_SIZE, logo_template
+
+
+def qr_matrix(code):
+    """QR modules for `code` as rows of booleans (True = dark), quiet zone included"""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H)
+    qr.add_data(code)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def qr_size(matrix):
+    """Side in pixels of the QR on the badge"""
+    return len(matrix) * QR_BOX_SIZE // QR_FACTOR
+
+
+def make_qr_image(code):
+    """Paint the QR at one pixel per module and scale it straight to its size on the logo"""
+    matrix = qr_matrix(code)
+    modules = len(matrix)
+    pixels = bytes(0 if dark else 255 for row in matrix for dark in row)
+    qr_img = Image.frombytes("L", (modules, modules), pixels)
+    size = qr_size(matrix)
+    return qr_img.resize((size, size), Image.Resampling.NEAREST)
+
+
+def render_badge_image(code):
+    """Composite the QR for `code` onto a copy of the event logo"""
+    qr_img = make_qr_image(code)
+
+    badge = logo_template.copy()
+    # Paste QR at bottom left
+    position = (QR_MARGIN, badge.height - qr_img.height - QR_MARGIN)
+    badge.paste(qr_img, position)
+    return badge
+
+
+def encode_png(image):
+    """PNG bytes using the BADGE_PNG_* size/CPU trade-offs"""
+    if image.mode == "RGBA" and image.getchannel("A").getextrema() == (255, 255):
+        # Opaque anyway (the stock logo is a JPEG); an alpha channel only adds bytes
+        image = image.convert("RGB")
+    if settings.BADGE_PNG_PALETTE and image.mode == "RGB":
+        image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        format="PNG",
+        compress_level=settings.BADGE_PNG_COMPRESS_LEVEL,
+        optimize=settings.BADGE_PNG_OPTIMIZE,
+    )
+    return buffer.getvalue()
+
+
+def encode_webp(image):
+    buffer = BytesIO()
+    image.save(buffer, format="WEBP", quality=settings.BADGE_WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def render_badge(code):
+    """Badge for `code` as PNG bytes"""
+    return encode_png(render_badge_image(code))
+
+
+def render_badge_files(code):
+    """Bytes for the full badge PNG and its PNG and WebP list-view thumbnails"""
+    badge = render_badge_image(code)
+    png = encode_png(badge)
+    badge.thumbnail(THUMBNAIL_SIZE)
+    return png, encode_png(badge), encode_webp(badge)
@@ -0,0 +1,183 @@
+import logging
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('full_name', 'email', 'phone_number', 'qr_code_value')
+FTS_TABLE = 'guest_guest_fts'
+FTS_OBJECTS = (FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au')
+# The trigram tokenizer can only match terms of at least three characters
+FTS_MIN_TERM = 3
+
+
+# ---------------------------
+# SCHEMA
+# ---------------------------
+
+def install_sqlite_fts(schema_editor):
+    """(Re)create the FTS5 index and its sync triggers, then rebuild it from guest_guest"""
+    columns = ', '.join(SEARCH_FIELDS)
+    new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+    old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+    uninstall_sqlite_fts(schema_editor)
+    statements = [
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+        f"content='guest_guest', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON guest_guest BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON guest_guest BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {columns} ON guest_guest BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def uninstall_sqlite_fts(schema_editor):
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def install_postgres_trigram(schema_editor):
+    # icontains compiles to UPPER(col::text) LIKE UPPER(...), so index that expression
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS guest_guest_{field}_trgm "
+            f"ON guest_guest USING gin ((UPPER({field}::text)) gin_trgm_ops)"
+        )
+
+
+def uninstall_postgres_trigram(schema_editor):
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS guest_guest_{field}_trgm")
+
+
+def install_search_indexes(apps, schema_editor):
+    """
+    Migration hook for the vendor-specific search indexes.
+
+    On SQLite, migrations that rebuild guest_guest drop the FTS triggers;
+    ensure_search_indexes() puts them back after every migrate.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            install_sqlite_fts(schema_editor)
+        except OperationalError:
+            # SQLite built without FTS5 or older than 3.34 (no trigram tokenizer): LIKE search is used
+            uninstall_sqlite_fts(schema_editor)
+    elif vendor == 'postgresql':
+        install_postgres_trigram(schema_editor)
+
+
+def uninstall_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        uninstall_sqlite_fts(schema_editor)
+    elif vendor == 'postgresql':
+        uninstall_postgres_trigram(schema_editor)
+
+
+def sqlite_fts_installed(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(FTS_OBJECTS))})",
+            FTS_OBJECTS,
+        )
+        return len(cursor.fetchall()) == len(FTS_OBJECTS)
+
+
+def ensure_search_indexes(using='default'):
+    """
+    Reinstall the SQLite FTS index if any part of it is missing, as it is
+    after a migration rebuilds guest_guest. Run from post_migrate (see
+    guest.signals); returns True if it had to.
+    """
+    global _backend
+    conn = connections[using]
+    if conn.vendor != 'sqlite' or 'guest_guest' not in conn.introspection.table_names():
+        return False
+    if sqlite_fts_installed(conn):
+        return False
+    logger.info("Reinstalling the SQLite FTS index for guests")
+    with conn.schema_editor() as schema_editor:
+        install_search_indexes(None, schema_editor)
+    _backend = None
+    return True
+
+
+# ---------------------------
+# BACKENDS
+# ---------------------------
+
+class LikeSearch:
+    name = 'like'
+
+    def filter(self, queryset, term):
+        query = Q()
+        for field in SEARCH_FIELDS:
+            query |= Q(**{f'{field}__icontains': term})
+        return queryset.filter(query)
+
+
+class TrigramSearch(LikeSearch):
+    """PostgreSQL: same lookups as LikeSearch; the pg_trgm indexes make them fast"""
+    name = 'pg_trgm'
+
+
+class SqliteFtsSearch(LikeSearch):
+    name = 'fts5'
+
+    def filter(self, queryset, term):
+        if len(term) < FTS_MIN_TERM:
+            return super().filter(queryset, term)
+        # A quoted FTS5 string is matched as a substring by the trigram tokenizer
+        match = '"' + term.replace('"', '""') + '"'
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match],
+        ))
+
+
+def _sqlite_fts_ready():
+    if sqlite_fts_installed(connection):
+        return True
+    # No FTS5 in this SQLite, or migrations haven't run since a table rebuild; a stale index is worse than none
+    logger.warning("SQLite FTS index for guests is missing or out of sync; falling back to LIKE search")
+    return False
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        if connection.vendor == 'sqlite' and _sqlite_fts_ready():
+            _backend = SqliteFtsSearch()
+        elif connection.vendor == 'postgresql':
+            _backend = TrigramSearch()
+        else:
+            _backend = LikeSearch()
+    return _backend
+
+
+def search_guests(queryset, term):
+    """
+    Guests whose name, email, phone or code contains `term`.
+
+    Uses an FTS5 trigram index on SQLite and pg_trgm indexes on PostgreSQL so
+    substring search doesn't scan the whole table; falls back to icontains.
+    """
+    term = (term or '').strip()
+    if not term:
+        return queryset
+    return get_search_backend().filter(queryset, term)
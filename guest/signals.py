@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .caching import guests_changed
+from . import search, stats
+from .checkin import code_index
+from .metrics import record_query
+from .models import Guest, GuestTombstone
+
+
+@receiver(post_save, sender=Guest)
+def guest_saved(sender, instance, created, update_fields=None, **kwargs):
+    code_index.put(instance, update_fields)
+    stats.guest_saved(instance, created, update_fields)
+    guests_changed([instance.qr_code_value])
+
+
+@receiver(post_delete, sender=Guest)
+def guest_deleted(sender, instance, **kwargs):
+    code_index.discard(instance.pk)
+    GuestTombstone.objects.create(code=instance.qr_code_value)
+    stats.guest_deleted(instance)
+    guests_changed([instance.qr_code_value])
+
+
+@receiver(post_migrate)
+def restore_search_indexes(sender, using, **kwargs):
+    # Any migration that rebuilds guest_guest on SQLite drops the FTS triggers
+    if sender.name == 'guest':
+        search.ensure_search_indexes(using)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    # Counts and times queries for the request or job being measured (see guest.metrics).
+    # The signal fires on every reconnect of the same long-lived wrapper, so install it once
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,58 @@
+"""XLSX writing with openpyxl, kept out of guest.exports so it is only imported when a spreadsheet is built"""
+from tempfile import SpooledTemporaryFile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from .exports import EXPORT_HEADERS, XLSX_COLUMN_WIDTHS, XLSX_SPOOL_SIZE
+
+
+class XlsxStyles:
+    """Header and zebra-stripe styles, built once and shared by every cell"""
+
+    def __init__(self):
+        self.header_fill = PatternFill(start_color="0D6EFD", end_color="0D6EFD", fill_type="solid")
+        self.header_font = Font(bold=True, color="FFFFFF", size=12)
+        self.header_alignment = Alignment(horizontal="center", vertical="center")
+        self.stripe_fill = PatternFill(start_color="F8F9FA", end_color="F8F9FA", fill_type="solid")
+
+
+def write_xlsx(rows, title="Guests"):
+    """
+    Write rows to an XLSX file using openpyxl's write-only mode.
+
+    Rows are serialized as they arrive instead of being kept as a worksheet
+    object model. Returns a spooled temp file rewound to the start.
+    """
+    styles = XlsxStyles()
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for column, width in XLSX_COLUMN_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+
+    header = []
+    for value in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.fill = styles.header_fill
+        cell.font = styles.header_font
+        cell.alignment = styles.header_alignment
+        header.append(cell)
+    ws.append(header)
+
+    # Alternate row coloring, starting with the first data row
+    for idx, row in enumerate(rows, start=2):
+        if idx % 2 == 0:
+            striped = []
+            for value in row:
+                cell = WriteOnlyCell(ws, value=value)
+                cell.fill = styles.stripe_fill
+                striped.append(cell)
+            ws.append(striped)
+        else:
+            ws.append(row)
+
+    spool = SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE)
+    wb.save(spool)
+    spool.seek(0)
+    return spool
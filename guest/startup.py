@@ -0,0 +1,28 @@
+"""
+Warm-up for gunicorn's preload mode (GUNICORN_PRELOAD=True).
+
+The master imports the app, the URLconf and the modules that are otherwise
+loaded lazily on a worker's first badge or spreadsheet, so every forked
+worker shares those pages copy-on-write instead of importing its own copy.
+"""
+from importlib import import_module
+from importlib.util import find_spec
+
+from django.db import connections
+from django.urls import get_resolver
+
+# Loaded lazily by the request paths that need them
+PRELOAD_MODULES = ('guest.rendering', 'guest.spreadsheets', 'openpyxl.reader.excel')
+
+
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        if find_spec(name.split('.')[0]) is not None:
+            import_module(name)
+
+
+def preload():
+    get_resolver().url_patterns
+    preload_modules()
+    # Forked workers must open their own connections (warm_code_index used one)
+    connections.close_all()
@@ -0,0 +1,263 @@
+"""
+Precomputed dashboard statistics.
+
+Running totals (StatCounter) and per-day rollups (DailyStat) are adjusted by
+deltas in the same transaction as the guest change behind them: save() and
+delete() through signals, and the bulk paths (imports, check-in scans, badge
+emails) by calling record() themselves. Reading them is a couple of small
+queries however many guests there are.
+
+reconcile() recomputes everything from the guest rows. The worker runs it
+every STATS_RECONCILE_INTERVAL seconds to correct any drift from writes that
+bypass both, such as .update() in a shell.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Q, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyStat, Guest, StatCounter
+
+logger = logging.getLogger(__name__)
+
+GUESTS = 'guests'
+CHECKED_IN = 'checked_in'
+# Daily rollups
+REGISTRATIONS = 'registrations'
+IMPORTED = 'imported'
+CHECK_INS = 'check_ins'
+DAILY = (REGISTRATIONS, IMPORTED, CHECK_INS)
+
+# Guest fields the statistics depend on
+FIELDS = ('badge_status', 'checked_in_at', 'created_at', 'source')
+
+CHART_DAYS = 30
+
+
+def badge_counter(status):
+    return f'badge_{status}'
+
+
+def source_counter(source):
+    return f'source_{source}'
+
+
+def state(guest, fields=FIELDS):
+    return {field: getattr(guest, field) for field in fields}
+
+
+def _count(values, sign, counters, daily):
+    """
+    Add (sign=1) or take away (sign=-1) one guest's share of every statistic.
+    `values` may hold only some of FIELDS: a change passes the same fields
+    before and after, so whatever it leaves out cancels.
+    """
+    counters[GUESTS] += sign
+    if 'badge_status' in values:
+        counters[badge_counter(values['badge_status'])] += sign
+    if 'source' in values:
+        counters[source_counter(values['source'])] += sign
+    if values.get('created_at'):
+        day = timezone.localdate(values['created_at'])
+        daily[day, REGISTRATIONS] += sign
+        if values.get('source') == Guest.SOURCE_IMPORT:
+            daily[day, IMPORTED] += sign
+    if values.get('checked_in_at'):
+        counters[CHECKED_IN] += sign
+        daily[timezone.localdate(values['checked_in_at']), CHECK_INS] += sign
+
+
+def record(changes):
+    """
+    Apply guest changes given as (before, after) pairs of state() dicts; None
+    stands for a guest that didn't exist before or doesn't after. Call it
+    inside the transaction that makes the change.
+    """
+    counters, daily = Counter(), Counter()
+    for before, after in changes:
+        if before is not None:
+            _count(before, -1, counters, daily)
+        if after is not None:
+            _count(after, 1, counters, daily)
+    counters = {name: delta for name, delta in counters.items() if delta}
+    daily = {key: delta for key, delta in daily.items() if delta}
+    if not counters and not daily:
+        return
+    # Counters before rollups, each in name order, so concurrent writers
+    # (and reconcile) lock rows in the same order and can't deadlock
+    try:
+        with transaction.atomic():
+            _bump(StatCounter, counters, _counter_match)
+            _bump(DailyStat, daily, _daily_match)
+        return
+    except _MissingRows:
+        # An UPDATE's count can't say which rows it missed (not created yet, or
+        # being rebuilt by reconcile), so undo both and apply each delta on its own
+        pass
+    with transaction.atomic():
+        _bump_each(StatCounter, counters, _counter_match, lambda name: {'name': name})
+        _bump_each(DailyStat, daily, _daily_match, lambda key: {'day': key[0], 'name': key[1]})
+
+
+class _MissingRows(Exception):
+    pass
+
+
+def _counter_match(name):
+    return Q(name=name)
+
+
+def _daily_match(key):
+    return Q(day=key[0], name=key[1])
+
+
+def _bump(model, deltas, match):
+    """Add deltas to existing rows in one UPDATE; raises _MissingRows if any row isn't there"""
+    if not deltas:
+        return
+    keys = sorted(deltas)
+    whens = [When(match(key), then=deltas[key]) for key in keys]
+    lookup = Q()
+    for key in keys:
+        lookup |= match(key)
+    if model.objects.filter(lookup).update(value=F('value') + Case(*whens, default=0)) != len(keys):
+        raise _MissingRows
+
+
+def _bump_each(model, deltas, match, fields):
+    """Add each delta to its row, creating the rows that don't exist yet"""
+    for key in sorted(deltas):
+        while not model.objects.filter(match(key)).update(value=F('value') + deltas[key]):
+            try:
+                with transaction.atomic():
+                    model.objects.create(value=deltas[key], **fields(key))
+                break
+            except IntegrityError:
+                # Created by a concurrent writer after the update; add to it
+                continue
+
+
+def guest_saved(guest, created, update_fields=None):
+    # Only the fields this save wrote: reading others could load deferred fields one query at a time
+    fields = [field for field in FIELDS if created or update_fields is None or field in update_fields]
+    if created:
+        record([(None, state(guest))])
+    else:
+        loaded = getattr(guest, '_loaded', {})
+        if not all(field in loaded for field in fields):
+            # Loaded with only()/defer(): the old values are unknown, so leave it to reconcile()
+            return
+        before = {field: loaded[field] for field in fields}
+        after = state(guest, fields)
+        if before != after:
+            record([(before, after)])
+    if hasattr(guest, '_loaded'):
+        guest._loaded.update(state(guest, fields))
+    else:
+        guest._loaded = state(guest, fields)
+
+
+def guest_deleted(guest):
+    record([(state(guest), None)])
+
+
+# ---------------------------
+# READING
+# ---------------------------
+
+def counter(name):
+    """Current value of one running total"""
+    return StatCounter.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+def snapshot(days=CHART_DAYS):
+    """Everything the dashboard shows, from the precomputed rows"""
+    counters = dict(StatCounter.objects.values_list('name', 'value'))
+    today = timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    daily = {
+        (day, name): value
+        for day, name, value in DailyStat.objects.filter(day__gte=first).values_list('day', 'name', 'value')
+    }
+    dates = [first + timedelta(days=offset) for offset in range(days)]
+
+    guests = counters.get(GUESTS, 0)
+    checked_in = counters.get(CHECKED_IN, 0)
+    badges = {status: counters.get(badge_counter(status), 0) for status, _ in Guest.BADGE_STATUS_CHOICES}
+    return {
+        'guests': guests,
+        'checked_in': checked_in,
+        'check_in_rate': round(checked_in / guests * 100, 1) if guests else 0.0,
+        'badges': badges,
+        'emails_pending': badges[Guest.BADGE_PENDING] + badges[Guest.BADGE_READY],
+        'emails_failed': badges[Guest.BADGE_FAILED],
+        'sources': {source: counters.get(source_counter(source), 0) for source, _ in Guest.SOURCE_CHOICES},
+        'daily': {
+            'days': [day.isoformat() for day in dates],
+            **{name: [daily.get((day, name), 0) for day in dates] for name in DAILY},
+        },
+    }
+
+
+# ---------------------------
+# RECONCILIATION
+# ---------------------------
+
+def _expected():
+    guests = Guest.objects.all()
+    totals = guests.aggregate(guests=Count('pk'), checked_in=Count('checked_in_at'))
+    counters = {GUESTS: totals['guests'], CHECKED_IN: totals['checked_in']}
+    for status, count in guests.values_list('badge_status').annotate(Count('pk')).order_by():
+        counters[badge_counter(status)] = count
+    for source, count in guests.values_list('source').annotate(Count('pk')).order_by():
+        counters[source_counter(source)] = count
+
+    tz = timezone.get_current_timezone()
+    daily = {}
+    rollups = [
+        (REGISTRATIONS, 'created_at', guests),
+        (IMPORTED, 'created_at', guests.filter(source=Guest.SOURCE_IMPORT)),
+        (CHECK_INS, 'checked_in_at', guests.filter(checked_in_at__isnull=False)),
+    ]
+    for name, field, queryset in rollups:
+        rows = queryset.annotate(day=TruncDate(field, tzinfo=tz)).values_list('day').annotate(Count('pk')).order_by()
+        for day, count in rows:
+            daily[day, name] = count
+    return counters, daily
+
+
+def _rebuild():
+    with transaction.atomic():
+        # Hold the counter rows so increments committing meanwhile wait and land on top of the new values
+        list(StatCounter.objects.select_for_update().order_by('name'))
+        counters, daily = _expected()
+        current = dict(StatCounter.objects.values_list('name', 'value'))
+        current_daily = {(day, name): value for day, name, value in DailyStat.objects.values_list('day', 'name', 'value')}
+
+        drift = {name: counters.get(name, 0) - current.get(name, 0) for name in counters.keys() | current.keys()}
+        for key in daily.keys() | current_daily.keys():
+            delta = daily.get(key, 0) - current_daily.get(key, 0)
+            if delta:
+                drift[f'{key[1]}:{key[0].isoformat()}'] = delta
+        drift = {name: delta for name, delta in drift.items() if delta}
+
+        if drift:
+            StatCounter.objects.all().delete()
+            StatCounter.objects.bulk_create([StatCounter(name=name, value=value) for name, value in counters.items()])
+            DailyStat.objects.all().delete()
+            DailyStat.objects.bulk_create([
+                DailyStat(day=day, name=name, value=value) for (day, name), value in daily.items()
+            ])
+    return drift
+
+
+def reconcile():
+    """Recompute every counter and rollup from the guest rows; returns {statistic: correction} for any that were off"""
+    drift = _rebuild()
+    if drift:
+        logger.warning("Stats reconciled, corrected %s", drift)
+    return drift
@@ -0,0 +1,104 @@
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from guest import stats
+from guest.badges import badge_key, badge_thumbnail_url, ensure_badge, store_badge
+from guest.checkin import code_index
+from guest.models import Guest
+
+
+def guest_queries(captured):
+    return [query for query in captured if '"guest_guest"' in query['sql'].split(' WHERE ')[0]]
+
+
+class BadgeStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.addCleanup(code_index.clear)
+
+    def test_store_badge_on_deferred_guest_is_one_update(self):
+        guest = Guest.objects.create(full_name='Ada Lovelace', email='ada@example.com', phone_number='0800 111')
+        guest = Guest.objects.only('pk', 'qr_code_value', 'qr_image', 'badge_hash', 'badge_status').get(pk=guest.pk)
+
+        with CaptureQueriesContext(connection) as captured:
+            store_badge(guest, badge_key(guest.qr_code_value), b'png', b'thumb', b'webp')
+        # The rest are the statistics moving the guest from pending to ready
+        self.assertEqual(len(guest_queries(captured)), 1)
+
+        guest = Guest.objects.get(pk=guest.pk)
+        self.assertEqual(guest.badge_hash, badge_key(guest.qr_code_value))
+        self.assertEqual(guest.badge_status, Guest.BADGE_READY)
+        # Untouched by a save that didn't write them
+        self.assertEqual((guest.email_normalized, guest.phone_normalized), ('ada@example.com', '0800111'))
+
+    def test_store_badge_marks_the_badge_ready_unless_sent(self):
+        failed = Guest.objects.create(
+            full_name='Ada Lovelace', email='ada@example.com', phone_number='0800 111', badge_status=Guest.BADGE_FAILED,
+        )
+        sent = Guest.objects.create(
+            full_name='Grace Hopper', email='grace@example.com', phone_number='0800 222', badge_status=Guest.BADGE_SENT,
+        )
+        for guest in (failed, sent):
+            store_badge(guest, badge_key(guest.qr_code_value), b'png', b'thumb', b'webp')
+
+        self.assertEqual(Guest.objects.get(pk=failed.pk).badge_status, Guest.BADGE_READY)
+        self.assertEqual(Guest.objects.get(pk=sent.pk).badge_status, Guest.BADGE_SENT)
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_rebuild_costs_one_query_per_guest(self):
+        for i in range(5):
+            Guest.objects.create(full_name=f'Guest {i}', email=f'guest{i}@example.com', phone_number=f'0800{i}')
+
+        with CaptureQueriesContext(connection) as captured:
+            call_command('rebuild_badges', workers=1, skip_file_check=True, stdout=StringIO())
+
+        # Two batch SELECTs (the second finds nothing) and one UPDATE per badge
+        self.assertEqual(len(guest_queries(captured)), 2 + 5)
+        self.assertFalse(Guest.objects.filter(badge_hash='').exists())
+        self.assertEqual(set(Guest.objects.values_list('badge_status', flat=True)), {Guest.BADGE_READY})
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_deferred_save_keeps_code_index_without_queries(self):
+        guest = Guest.objects.create(full_name='Grace Hopper', email='grace@example.com', phone_number='0800 222')
+        self.assertEqual(code_index.get(guest.qr_code_value)[1], 'Grace Hopper')
+
+        deferred = Guest.objects.only('pk', 'qr_code_value', 'emailed_at').get(pk=guest.pk)
+        deferred.emailed_at = guest.created_at
+        with self.assertNumQueries(1):
+            deferred.save(update_fields=['emailed_at'])
+        self.assertEqual(code_index.get(guest.qr_code_value)[1], 'Grace Hopper')
+
+
+class SeparateHostBadgeTests(TestCase):
+    """The worker renders badges onto its own disk; the web service has to serve them from its own"""
+
+    def setUp(self):
+        self.addCleanup(code_index.clear)
+        self.guest = Guest.objects.create(full_name='Ada Lovelace', email='ada@example.com', phone_number='0800 111')
+        with tempfile.TemporaryDirectory() as worker_media, override_settings(MEDIA_ROOT=worker_media):
+            ensure_badge(self.guest)
+        web_media = tempfile.TemporaryDirectory()
+        self.addCleanup(web_media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=web_media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_web_service_renders_a_badge_it_does_not_have(self):
+        for url in (self.guest.qr_image.url, badge_thumbnail_url(self.guest)):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(b''.join(response.streaming_content))
+
+    def test_superseded_badge_is_not_rebuilt(self):
+        url = self.guest.qr_image.url.replace(self.guest.badge_hash, '0' * 16)
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,82 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from guest.checkin import code_index
+from guest.importer import import_rows
+from guest.models import Guest
+
+LOCMEM = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'caching-tests'}
+
+
+def dashboard_page(client, **params):
+    return client.get('/dashboard/data/', {'draw': 1, 'start': 0, 'length': 10, **params}).json()
+
+
+@override_settings(CACHES={'default': LOCMEM, 'pages': LOCMEM})
+class PageCacheTests(TestCase):
+    """With a page cache (a shared backend in production; locmem suffices within one process)"""
+
+    def setUp(self):
+        caches['pages'].clear()
+        self.guest = Guest.objects.create(full_name='Ada Lovelace', email='ada@example.com', phone_number='0800')
+
+    def tearDown(self):
+        caches['pages'].clear()
+        code_index.clear()
+
+    def test_success_page_is_cached_until_the_guest_changes(self):
+        url = f'/success/{self.guest.qr_code_value}/'
+        self.assertContains(self.client.get(url), 'Ada Lovelace')
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertContains(cached, 'Ada Lovelace')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guest.full_name = 'Ada King'
+            self.guest.save()
+        self.assertContains(self.client.get(url), 'Ada King')
+
+    def test_success_page_revalidates_with_its_etag(self):
+        url = f'/success/{self.guest.qr_code_value}/'
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_list_pages_follow_bulk_imports(self):
+        self.assertEqual(dashboard_page(self.client)['recordsTotal'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard_page(self.client)['recordsTotal'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_rows([(2, 'Grace Hopper', 'grace@example.com', '0801'), (3, 'Alan Turing', 'alan@example.com', '0802')])
+
+        page = dashboard_page(self.client)
+        self.assertEqual((page['recordsTotal'], page['recordsFiltered'], len(page['data'])), (3, 3, 3))
+        self.assertEqual(dashboard_page(self.client, **{'search[value]': 'Hopper'})['recordsFiltered'], 1)
+
+    def test_deleting_a_guest_drops_its_page(self):
+        url = f'/success/{self.guest.qr_code_value}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guest.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(dashboard_page(self.client)['recordsTotal'], 0)
+
+
+@override_settings(CACHES={'default': LOCMEM, 'pages': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class PerProcessCacheTests(TestCase):
+    """The default locmem setup: another process's invalidations can't reach it, so pages aren't cached"""
+
+    def tearDown(self):
+        code_index.clear()
+
+    def test_pages_are_read_fresh(self):
+        guest = Guest.objects.create(full_name='Ada Lovelace', email='ada@example.com', phone_number='0800')
+        self.client.get(f'/success/{guest.qr_code_value}/')
+        dashboard_page(self.client)
+
+        # As the worker would, in a process whose cache this one can't see
+        Guest.objects.filter(pk=guest.pk).update(full_name='Ada King')
+        import_rows([(2, 'Grace Hopper', 'grace@example.com', '0801')])
+
+        self.assertContains(self.client.get(f'/success/{guest.qr_code_value}/'), 'Ada King')
+        self.assertEqual(dashboard_page(self.client)['recordsTotal'], 2)
@@ -0,0 +1,143 @@
+import json
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from guest import views
+from guest.checkin import build_manifest, code_index, from_version
+from guest.models import Guest
+
+TOKEN = 'scanner-secret'
+SCANNER = {'Authorization': f'Bearer {TOKEN}'}
+
+
+def guest(name, **fields):
+    return Guest.objects.create(
+        full_name=name, email=f'{name.split()[0].lower()}@example.com', phone_number='0800', **fields,
+    )
+
+
+class ManifestTests(TestCase):
+    def tearDown(self):
+        code_index.clear()
+
+    def test_delta_includes_change_committed_after_a_later_version(self):
+        ada = guest('Ada Lovelace')
+        grace = guest('Grace Hopper')
+        version = build_manifest()['version']
+        self.assertEqual(from_version(version), Guest.objects.get(pk=grace.pk).updated_at)
+
+        # A check-in stamped before `version` whose transaction only committed after that manifest
+        stamped = from_version(version) - timedelta(seconds=1)
+        Guest.objects.filter(pk=ada.pk).update(checked_in_at=stamped, updated_at=stamped)
+
+        delta = build_manifest(version)
+        self.assertIn([ada.qr_code_value, 'Ada Lovelace', True], delta['guests'])
+
+    @override_settings(CHECKIN_MANIFEST_OVERLAP=60)
+    def test_delta_leaves_out_changes_older_than_the_overlap(self):
+        old = guest('Old Guest')
+        Guest.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        current = guest('Current Guest')
+        version = build_manifest()['version']
+        recent = guest('Recent Guest')
+
+        codes = [code for code, _, _ in build_manifest(version)['guests']]
+        self.assertEqual(codes, [current.qr_code_value, recent.qr_code_value])
+
+    def test_deleted_codes_are_removed(self):
+        ada = guest('Ada Lovelace')
+        version = build_manifest()['version']
+        ada.delete()
+        self.assertEqual(build_manifest(version)['removed'], [ada.qr_code_value])
+
+
+@override_settings(CHECKIN_TOKEN=TOKEN)
+class ManifestViewTests(TestCase):
+    def tearDown(self):
+        code_index.clear()
+
+    def test_etag_changes_when_a_late_commit_keeps_the_version(self):
+        ada = guest('Ada Lovelace')
+        guest('Grace Hopper')
+        first = self.client.get('/checkin/manifest/', headers=SCANNER)
+        self.assertEqual(first.status_code, 200)
+        revalidated = self.client.get('/checkin/manifest/', headers={**SCANNER, 'If-None-Match': first['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+        stamped = from_version(first.json()['version']) - timedelta(seconds=1)
+        Guest.objects.filter(pk=ada.pk).update(checked_in_at=stamped, updated_at=stamped)
+
+        second = self.client.get('/checkin/manifest/', headers={**SCANNER, 'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['version'], first.json()['version'])
+        self.assertIn([ada.qr_code_value, 'Ada Lovelace', True], second.json()['guests'])
+
+
+@override_settings(CHECKIN_TOKEN=TOKEN)
+class ScannerAuthTests(TestCase):
+    def setUp(self):
+        self.guest = guest('Ada Lovelace')
+
+    def tearDown(self):
+        code_index.clear()
+
+    def requests(self, headers):
+        code = self.guest.qr_code_value
+        return {
+            'checkin': self.client.post(f'/checkin/{code}/', headers=headers),
+            'batch': self.client.post(
+                '/checkin/batch/', json.dumps({'scans': [{'code': code}]}), content_type='application/json', headers=headers,
+            ),
+            'manifest': self.client.get('/checkin/manifest/', headers=headers),
+        }
+
+    def test_endpoints_refuse_requests_without_the_token(self):
+        for headers in ({}, {'Authorization': 'Bearer wrong'}, {'Authorization': TOKEN}):
+            for name, response in self.requests(headers).items():
+                with self.subTest(name=name, headers=headers):
+                    self.assertEqual(response.status_code, 401)
+                    self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+        self.assertIsNone(Guest.objects.get(pk=self.guest.pk).checked_in_at)
+
+    def test_endpoints_accept_the_token(self):
+        for name, response in self.requests(SCANNER).items():
+            with self.subTest(name=name):
+                self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(Guest.objects.get(pk=self.guest.pk).checked_in_at)
+
+    @override_settings(CHECKIN_TOKEN='')
+    def test_endpoints_are_closed_without_a_configured_token(self):
+        for name, response in self.requests({'Authorization': 'Bearer '}).items():
+            with self.subTest(name=name):
+                self.assertEqual(response.status_code, 401)
+
+    def test_async_checkin_requires_the_token(self):
+        factory = AsyncRequestFactory()
+        code = self.guest.qr_code_value
+        denied = async_to_sync(views.acheckin)(factory.post(f'/checkin/{code}/'), code)
+        self.assertEqual(denied.status_code, 401)
+        admitted = async_to_sync(views.acheckin)(factory.post(f'/checkin/{code}/', headers=SCANNER), code)
+        self.assertEqual(admitted.status_code, 200)
+
+    @override_settings(CHECKIN_SCAN_MAX_AGE=3600)
+    def test_batch_rejects_back_dated_scans(self):
+        scans = [
+            {'code': self.guest.qr_code_value, 'scanned_at': '2020-01-01T09:00:00Z'},
+            {'code': self.guest.qr_code_value, 'scanned_at': (timezone.now() - timedelta(hours=2)).isoformat()},
+        ]
+        response = self.client.post(
+            '/checkin/batch/', json.dumps({'scans': scans}), content_type='application/json', headers=SCANNER,
+        )
+        [result] = response.json()['results']
+        self.assertEqual(result['status'], 'invalid')
+        self.assertIsNone(Guest.objects.get(pk=self.guest.pk).checked_in_at)
+
+        recent = (timezone.now() - timedelta(minutes=10)).isoformat()
+        response = self.client.post(
+            '/checkin/batch/', json.dumps({'scans': [{'code': self.guest.qr_code_value, 'scanned_at': recent}]}),
+            content_type='application/json', headers=SCANNER,
+        )
+        self.assertEqual(response.json()['results'][0]['status'], 'admitted')
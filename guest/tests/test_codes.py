@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from guest import codes
+from guest.checkin import code_index
+from guest.codes import CODE_ALPHABET, CODE_BLOCK_SIZE, CODE_LENGTH, CodeAllocator, random_codes
+from guest.importer import IMPORT_CHUNK_SIZE, import_rows
+from guest.models import Guest
+
+
+def seed(count):
+    guests = [
+        Guest(full_name=f'Guest {i}', email=f'guest{i}@example.com', phone_number=f'0800{i:07d}', qr_code_value=f'{i:08X}')
+        for i in range(count)
+    ]
+    for guest in guests:
+        guest.normalize()
+    Guest.objects.bulk_create(guests)
+    return {guest.qr_code_value for guest in guests}
+
+
+class RandomCodesTests(TestCase):
+    def test_codes_are_distinct_and_well_formed(self):
+        drawn = random_codes(10000)
+        self.assertEqual(len(drawn), 10000)
+        for code in drawn:
+            self.assertEqual(len(code), CODE_LENGTH)
+            self.assertLessEqual(set(code), set(CODE_ALPHABET))
+
+
+class CodeAllocatorTests(TestCase):
+    def tearDown(self):
+        code_index.clear()
+
+    def test_a_million_codes_are_well_formed_and_unused(self):
+        existing = seed(2000)
+        allocator = CodeAllocator()
+        taken = []
+        # Importer-sized requests, as a big import makes them
+        while len(taken) < 1000000:
+            taken.extend(allocator.take_many(IMPORT_CHUNK_SIZE))
+
+        unique = set(taken)
+        self.assertFalse(unique & existing)
+        self.assertEqual({len(code) for code in unique}, {CODE_LENGTH})
+        self.assertLessEqual(set(''.join(taken)), set(CODE_ALPHABET))
+        # Nothing is saved here, so a repeat across blocks is not excluded by the database check;
+        # over 36^8 codes a million draws expect ~0.2 of them (an import saves each chunk first)
+        self.assertLessEqual(len(taken) - len(unique), 5)
+        # One verification query per block, not per code
+        self.assertEqual(allocator.queries, -(-len(taken) // CODE_BLOCK_SIZE))
+
+    def test_codes_in_use_are_skipped(self):
+        existing = sorted(seed(50))
+        fresh = ['NEWCODE1', 'NEWCODE2', 'NEWCODE3']
+        draws = iter([set(existing[:20] + fresh[:2]), set(existing[20:] + fresh[2:])])
+        with mock.patch.object(codes, 'random_codes', side_effect=lambda count: next(draws)):
+            allocator = CodeAllocator(block_size=3)
+            self.assertEqual(sorted(allocator.take_many(3)), fresh)
+        self.assertEqual(allocator.queries, 2)
+
+    def test_import_saves_every_allocated_code(self):
+        seed(1000)
+        with mock.patch('guest.importer.allocator', CodeAllocator()):
+            result = import_rows(
+                (i + 2, f'New {i}', f'new{i}@example.com', f'0900{i:07d}') for i in range(20000)
+            )
+        self.assertEqual((result.imported, result.skipped), (20000, 0))
+        self.assertEqual(Guest.objects.values('qr_code_value').distinct().count(), 21000)
+
+    def test_taken_codes_are_not_handed_out_again(self):
+        allocator = CodeAllocator(block_size=10)
+        first = allocator.take_many(7)
+        second = allocator.take_many(7)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(len(set(first + second)), 14)
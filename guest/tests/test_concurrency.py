@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+
+from guest import stats
+from guest.checkin import check_in, code_index
+from guest.jobs import enqueue
+from guest.models import Guest, Job
+
+
+def run_concurrently(func, *arg_lists):
+    """func(*args) for each set of args, all at once on their own threads and database connections"""
+    def call(*args):
+        try:
+            return func(*args)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=len(arg_lists[0])) as pool:
+        return list(pool.map(call, *arg_lists))
+
+
+class ConcurrentWriterTests(TransactionTestCase):
+    """Runs against the configured database; on SQLite that is a file in WAL mode (see SQLITE_PRAGMAS)"""
+
+    writers = 8
+    per_writer = 10
+
+    def tearDown(self):
+        code_index.clear()
+
+    def test_parallel_registrations_and_check_ins(self):
+        def write(worker):
+            for i in range(self.per_writer):
+                with transaction.atomic():
+                    guest = Guest.objects.create(
+                        full_name=f'Writer {worker} Guest {i}',
+                        email=f'w{worker}-{i}@example.com',
+                        phone_number=f'0700{worker:03d}{i:04d}',
+                    )
+                    enqueue(Job.SEND_BADGE, guest=guest)
+                self.assertFalse(check_in(guest.qr_code_value)['already_checked_in'])
+
+        # Any "database is locked" or deadlock error fails the test
+        run_concurrently(write, range(self.writers))
+
+        total = self.writers * self.per_writer
+        self.assertEqual(Guest.objects.count(), total)
+        self.assertEqual(Guest.objects.filter(checked_in_at__isnull=False).count(), total)
+        self.assertEqual(Job.objects.filter(kind=Job.SEND_BADGE).count(), total)
+        # Every writer's counter increments landed
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_concurrent_scans_admit_once(self):
+        guest = Guest.objects.create(full_name='Door Rush', email='rush@example.com', phone_number='0800')
+
+        results = run_concurrently(lambda _: check_in(guest.qr_code_value), range(self.writers))
+
+        self.assertEqual(sum(not result['already_checked_in'] for result in results), 1)
+        self.assertEqual(len({result['checked_in_at'] for result in results}), 1)
+        self.assertEqual(stats.reconcile(), {})
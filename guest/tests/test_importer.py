@@ -0,0 +1,84 @@
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+
+from guest.importer import run_import, start_import
+from guest.models import Guest, GuestImport, ImportRowError
+
+
+def csv_upload(rows, start=0, name='guests.csv'):
+    lines = ['Full Name,Email,Phone Number']
+    lines += [f'Guest {i},guest{i}@example.com,0800{i:07d}' for i in range(start, start + rows)]
+    return SimpleUploadedFile(name, ('\n'.join(lines) + '\n').encode(), content_type='text/csv')
+
+
+class RunImportTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def test_imports_every_row_in_chunks(self):
+        guest_import = start_import(csv_upload(25))
+        run_import(guest_import, chunk_size=10)
+
+        guest_import.refresh_from_db()
+        self.assertEqual(guest_import.status, GuestImport.DONE)
+        self.assertEqual((guest_import.rows_processed, guest_import.imported, guest_import.skipped), (25, 25, 0))
+        self.assertEqual(Guest.objects.filter(source=Guest.SOURCE_IMPORT).count(), 25)
+
+    def test_transient_database_error_leaves_checkpoint_for_retry(self):
+        guest_import = start_import(csv_upload(25))
+        bulk_create = Guest.objects.bulk_create
+        calls = []
+
+        def flaky(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise OperationalError('database is locked')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Guest.objects, 'bulk_create', side_effect=flaky):
+            with self.assertRaises(OperationalError):
+                run_import(guest_import, chunk_size=10)
+
+        guest_import.refresh_from_db()
+        # The first chunk committed; the failed one is neither imported nor recorded as skipped
+        self.assertEqual((guest_import.rows_processed, guest_import.imported, guest_import.skipped), (10, 10, 0))
+        self.assertFalse(ImportRowError.objects.exists())
+
+        # The job's retry resumes from the checkpoint
+        run_import(guest_import, chunk_size=10)
+        guest_import.refresh_from_db()
+        self.assertEqual((guest_import.rows_processed, guest_import.imported, guest_import.skipped), (25, 25, 0))
+        self.assertEqual(Guest.objects.count(), 25)
+
+    def test_integrity_error_skips_the_chunk(self):
+        taken = Guest.objects.create(full_name='Existing', email='existing@example.com', phone_number='1')
+        guest_import = start_import(csv_upload(3))
+
+        with mock.patch('guest.importer.allocator.take_many', return_value=[taken.qr_code_value] * 3):
+            with self.assertLogs('guest.importer', 'ERROR'):
+                run_import(guest_import)
+
+        guest_import.refresh_from_db()
+        self.assertEqual((guest_import.rows_processed, guest_import.imported, guest_import.skipped), (3, 0, 3))
+        self.assertEqual(ImportRowError.objects.filter(guest_import=guest_import).count(), 3)
+
+    def test_worker_needs_no_access_to_the_web_service_disk(self):
+        guest_import = start_import(csv_upload(5))
+        # The worker host has its own, empty MEDIA_ROOT
+        with tempfile.TemporaryDirectory() as worker_media, override_settings(MEDIA_ROOT=worker_media):
+            run_import(GuestImport.objects.get(pk=guest_import.pk))
+
+        guest_import.refresh_from_db()
+        self.assertEqual((guest_import.status, guest_import.imported), (GuestImport.DONE, 5))
+
+    def test_upload_is_only_loaded_by_the_import(self):
+        guest_import = start_import(csv_upload(5))
+        self.assertEqual(GuestImport.objects.get(pk=guest_import.pk).get_deferred_fields(), {'content'})
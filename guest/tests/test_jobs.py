@@ -0,0 +1,134 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from guest import jobs
+from guest.checkin import code_index
+from guest.jobs import backoff, claim, enqueue, requeue_stale, run
+from guest.models import Guest, Job
+
+from .test_concurrency import run_concurrently
+
+
+def guest(name='Ada Lovelace'):
+    return Guest.objects.create(full_name=name, email=f'{name.split()[0].lower()}@example.com', phone_number='0800')
+
+
+class JobTestCase(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.addCleanup(code_index.clear)
+
+    def claim_one(self):
+        [job] = claim(limit=1)
+        return job
+
+
+@override_settings(JOB_MAX_ATTEMPTS=3, JOB_RETRY_BACKOFF=30, JOB_RETRY_BACKOFF_MAX=3600)
+class RunTests(JobTestCase):
+    def test_backoff_doubles_up_to_the_maximum(self):
+        self.assertEqual([backoff(attempts) for attempts in (1, 2, 3, 4)], [30, 60, 120, 240])
+        self.assertEqual(backoff(20), 3600)
+
+    def test_failed_job_is_retried_after_its_backoff(self):
+        enqueue(Job.SEND_BADGE, guest=guest())
+        with mock.patch.object(jobs, 'build_badge_email', side_effect=SMTPException('mailbox full')):
+            with self.assertLogs('guest.jobs', 'WARNING'):
+                before = timezone.now()
+                self.assertFalse(run(self.claim_one()))
+
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.locked_at), (Job.QUEUED, 1, None))
+        self.assertIn('mailbox full', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=30))
+        # Not due again until the backoff has passed
+        self.assertEqual(claim(), [])
+
+    def test_last_attempt_marks_the_badge_failed(self):
+        ada = guest()
+        enqueue(Job.SEND_BADGE, guest=ada)
+        with mock.patch.object(jobs, 'build_badge_email', side_effect=SMTPException('mailbox full')):
+            for _ in range(3):
+                Job.objects.update(run_at=timezone.now())
+                with self.assertLogs('guest.jobs', 'WARNING'):
+                    run(self.claim_one())
+
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertEqual(Guest.objects.get(pk=ada.pk).badge_status, Guest.BADGE_FAILED)
+        self.assertEqual(mail.outbox, [])
+
+    def test_successful_job_sends_and_stamps_the_guest(self):
+        ada = guest()
+        enqueue(Job.SEND_BADGE, guest=ada)
+        with self.assertLogs('guest.jobs', 'INFO'):
+            self.assertTrue(run(self.claim_one()))
+
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        ada.refresh_from_db()
+        self.assertEqual(ada.badge_status, Guest.BADGE_SENT)
+        self.assertIsNotNone(ada.emailed_at)
+        self.assertEqual([message.to for message in mail.outbox], [['ada@example.com']])
+
+
+@override_settings(JOB_LOCK_TIMEOUT=600)
+class RequeueStaleTests(JobTestCase):
+    def test_only_jobs_locked_past_the_timeout_are_requeued(self):
+        stale, busy = enqueue(Job.RENDER_BADGE), enqueue(Job.RENDER_BADGE)
+        now = timezone.now()
+        Job.objects.filter(pk=stale.pk).update(status=Job.RUNNING, locked_at=now - timedelta(seconds=601))
+        Job.objects.filter(pk=busy.pk).update(status=Job.RUNNING, locked_at=now - timedelta(seconds=60))
+
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, Job.QUEUED)
+        self.assertIsNone(Job.objects.get(pk=stale.pk).locked_at)
+        self.assertEqual(Job.objects.get(pk=busy.pk).status, Job.RUNNING)
+
+
+class ClaimTests(JobTestCase):
+    def test_claims_due_jobs_in_order(self):
+        later = enqueue(Job.RENDER_BADGE, delay=60)
+        first, second = enqueue(Job.RENDER_BADGE), enqueue(Job.RENDER_BADGE)
+        self.assertEqual(claim(limit=10), [first, second])
+        self.assertEqual(Job.objects.get(pk=later.pk).status, Job.QUEUED)
+        self.assertEqual(set(Job.objects.filter(status=Job.RUNNING).values_list('attempts', flat=True)), {1})
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    """Workers polling at once against the configured database: every job is claimed exactly once"""
+
+    workers = 6
+
+    def test_each_job_goes_to_one_worker(self):
+        for _ in range(30):
+            enqueue(Job.RENDER_BADGE)
+
+        claimed = run_concurrently(lambda _: [job.pk for job in claim(limit=10)], range(self.workers))
+
+        pks = [pk for batch in claimed for pk in batch]
+        self.assertTrue(pks)
+        self.assertEqual(len(pks), len(set(pks)))
+        self.assertEqual(set(pks), set(Job.objects.filter(status=Job.RUNNING).values_list('pk', flat=True)))
+        self.assertEqual(set(Job.objects.filter(pk__in=pks).values_list('attempts', flat=True)), {1})
+
+
+class SendBadgesPendingTests(JobTestCase):
+    def test_badges_sent_before_emailed_at_existed_are_not_resent(self):
+        sent = guest('Ada Lovelace')
+        Guest.objects.filter(pk=sent.pk).update(badge_status=Guest.BADGE_SENT, emailed_at=None)
+        guest('Grace Hopper')
+
+        out = StringIO()
+        call_command('send_badges', '--pending', '--dry-run', stdout=out)
+        self.assertIn('1 guest(s) would be emailed', out.getvalue())
@@ -0,0 +1,145 @@
+import tempfile
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from guest import mail as guest_mail
+from guest import stats
+from guest.checkin import code_index
+from guest.mail import BulkSendError, RateLimiter, send_bulk
+from guest.models import Guest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_spaces_calls_at_the_rate(self):
+        clock = FakeClock()
+        with mock.patch.object(guest_mail.time, 'monotonic', clock.monotonic), \
+                mock.patch.object(guest_mail.time, 'sleep', clock.sleep):
+            limiter = RateLimiter(4)
+            for _ in range(3):
+                limiter.wait()
+            # Time spent sending counts towards the interval
+            clock.now += 0.1
+            limiter.wait()
+            # A long pause owes nothing
+            clock.now += 10
+            limiter.wait()
+        self.assertEqual(clock.sleeps, [0.25, 0.25, 0.15])
+
+    def test_zero_rate_never_waits(self):
+        with mock.patch.object(guest_mail.time, 'sleep') as sleep:
+            limiter = RateLimiter(0)
+            for _ in range(5):
+                limiter.wait()
+        sleep.assert_not_called()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', BULK_EMAIL_RATE=0)
+class BulkSendTestCase(TestCase):
+    guests = 5
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.addCleanup(code_index.clear)
+        self.pks = [
+            Guest.objects.create(full_name=f'Guest {i}', email=f'guest{i}@example.com', phone_number=f'0800{i}').pk
+            for i in range(self.guests)
+        ]
+
+    def recipients(self):
+        return [message.to[0] for message in mail.outbox]
+
+
+class SendBulkTests(BulkSendTestCase):
+    def test_batches_walk_the_keyset_on_one_connection_each(self):
+        progress = []
+        connections = []
+        get_connection = guest_mail.get_connection
+
+        def counting_connection():
+            connections.append(get_connection())
+            return connections[-1]
+
+        with mock.patch.object(guest_mail, 'get_connection', counting_connection):
+            sent = send_bulk(Guest.objects.all(), batch_size=2, progress=lambda *args: progress.append(args))
+
+        self.assertEqual(sent, self.guests)
+        self.assertEqual(len(connections), 3)
+        self.assertEqual(progress, [(2, self.pks[1]), (4, self.pks[3]), (5, self.pks[4])])
+        self.assertEqual(self.recipients(), [f'guest{i}@example.com' for i in range(self.guests)])
+        self.assertTrue(all(message.attachments for message in mail.outbox))
+
+    def test_sent_guests_are_stamped(self):
+        send_bulk(Guest.objects.filter(pk__in=self.pks[:3]), batch_size=2)
+
+        sent = Guest.objects.filter(pk__in=self.pks[:3])
+        self.assertFalse(sent.filter(emailed_at__isnull=True).exists())
+        self.assertEqual(set(sent.values_list('badge_status', flat=True)), {Guest.BADGE_SENT})
+        self.assertEqual(Guest.objects.filter(pk__in=self.pks[3:], emailed_at__isnull=True).count(), 2)
+        self.assertEqual(stats.counter(stats.badge_counter(Guest.BADGE_SENT)), 3)
+        self.assertEqual(stats.reconcile(), {})
+
+    def test_failure_mid_batch_resumes_from_last_id(self):
+        build = guest_mail.build_badge_email
+
+        def failing_build(guest, connection=None):
+            if guest.pk == self.pks[3]:
+                raise SMTPException('connection dropped')
+            return build(guest, connection=connection)
+
+        with mock.patch.object(guest_mail, 'build_badge_email', failing_build):
+            with self.assertRaises(BulkSendError) as failure:
+                send_bulk(Guest.objects.all(), batch_size=2)
+        self.assertEqual((failure.exception.sent, failure.exception.last_id), (3, self.pks[2]))
+        # The guest sent before the failure in its batch is stamped too
+        self.assertEqual(Guest.objects.filter(emailed_at__isnull=False).count(), 3)
+
+        self.assertEqual(send_bulk(Guest.objects.all(), batch_size=2, after_id=failure.exception.last_id), 2)
+        self.assertEqual(self.recipients(), [f'guest{i}@example.com' for i in range(self.guests)])
+
+
+class SendBadgesCommandTests(BulkSendTestCase):
+    guests = 4
+
+    def test_pending_resumes_without_resending(self):
+        build = guest_mail.build_badge_email
+
+        def failing_build(guest, connection=None):
+            if guest.pk == self.pks[2]:
+                raise SMTPException('connection dropped')
+            return build(guest, connection=connection)
+
+        with mock.patch.object(guest_mail, 'build_badge_email', failing_build):
+            with self.assertRaisesMessage(CommandError, f'--after-id {self.pks[1]}'):
+                call_command('send_badges', batch_size=10, stdout=StringIO())
+
+        out = StringIO()
+        call_command('send_badges', '--pending', batch_size=10, stdout=out)
+        self.assertIn('Sent 2 email(s)', out.getvalue())
+        self.assertEqual(self.recipients(), [f'guest{i}@example.com' for i in range(self.guests)])
+
+    def test_all_resends(self):
+        call_command('send_badges', stdout=StringIO())
+        call_command('send_badges', '--all', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2 * self.guests)
@@ -0,0 +1,124 @@
+import logging
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from guest.badges import BADGE_DIR, badge_key, store_badge
+from guest.checkin import code_index
+from guest.media import IMMUTABLE, byte_range
+from guest.models import Guest
+
+PNG = bytes(range(10))
+
+
+class ByteRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-3', (0, 3)),
+            ('bytes=4-', (4, 9)),
+            ('bytes=-3', (7, 9)),
+            ('bytes=-30', (0, 9)),
+            ('bytes=8-100', (8, 9)),
+            (' bytes=2-2 ', (2, 2)),
+        ]
+        for header, span in cases:
+            with self.subTest(header=header):
+                self.assertEqual(byte_range(header, 10), span)
+
+    def test_ignored_headers_send_the_whole_file(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-1,4-5', 'items=0-3', 'bytes=5-2'):
+            with self.subTest(header=header):
+                self.assertIsNone(byte_range(header, 10))
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=10-', 'bytes=20-30', 'bytes=-0'):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                byte_range(header, 10)
+
+
+class BadgeFileResponseTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.addCleanup(code_index.clear)
+        logger = logging.getLogger('guest')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.WARNING)
+        guest = Guest.objects.create(full_name='Ada Lovelace', email='ada@example.com', phone_number='0800 111')
+        store_badge(guest, badge_key(guest.qr_code_value), PNG, b'thumb', b'webp')
+        self.url = guest.qr_image.url
+        self.etag = f'"{guest.qr_code_value}-{guest.badge_hash}"'
+
+    def content(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_hashed_name_is_immutable(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), PNG)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_other_names_are_revalidated(self):
+        default_storage.save(f'{BADGE_DIR}/legacy.png', ContentFile(PNG))
+        response = self.client.get(f'/media/{BADGE_DIR}/legacy.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, PNG[2:6])
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_reversed_range_is_ignored(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), PNG)
+
+    def test_if_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=self.etag)
+        self.assertEqual((response.status_code, response.content), (206, PNG[:2]))
+        # A stale validator gets the whole current file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, self.content(response)), (200, PNG))
+
+    def test_missing_and_outside_names(self):
+        self.assertEqual(self.client.get(f'/media/{BADGE_DIR}/NOPE0000-0000000000000000.png').status_code, 404)
+        self.assertEqual(self.client.get(f'/media/{BADGE_DIR}/../imports/guests.csv').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.url.removeprefix('/media/'))
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.url.removeprefix('/media/')))
+        # Conditional requests are still answered here
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag).status_code, 304)
@@ -0,0 +1,36 @@
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from guest.metrics import collect, record_query
+from guest.models import Guest
+
+
+class QueryInstrumentationTests(TransactionTestCase):
+    def test_reconnects_do_not_stack_wrappers(self):
+        for _ in range(3):
+            connection.close()
+            connection.ensure_connection()
+        self.assertEqual(connection.execute_wrappers.count(record_query), 1)
+
+        with collect() as timings:
+            Guest.objects.count()
+        self.assertEqual(timings.queries, 1)
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsViewTests(SimpleTestCase):
+    def test_requires_the_token(self):
+        for headers in ({}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'scrape-secret'}):
+            with self.subTest(headers=headers):
+                response = self.client.get('/metrics/', headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_serves_prometheus_text_with_the_token(self):
+        response = self.client.get('/metrics/', headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '# TYPE reunion_http_requests_total counter')
+
+    @override_settings(METRICS_TOKEN='')
+    def test_is_not_found_without_a_configured_token(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
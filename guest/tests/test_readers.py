@@ -0,0 +1,86 @@
+import csv
+import os
+import tempfile
+import tracemalloc
+import unittest
+from io import BytesIO
+
+from django.test import SimpleTestCase
+
+from guest.importer import IMPORT_CHUNK_SIZE
+from guest.readers import HAS_OPENPYXL, ImportFileError, iter_csv_rows, iter_rows
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Full Name', 'Email', 'Phone Number'])
+        for i in range(rows):
+            writer.writerow([f'Guest {i}', f'guest{i}@example.com', f'0800{i:07d}'])
+
+
+def write_xlsx(path, rows):
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Guests')
+    ws.append(['Full Name', 'Email', 'Phone Number'])
+    for i in range(rows):
+        ws.append([f'Guest {i}', f'guest{i}@example.com', f'0800{i:07d}'])
+    wb.save(path)
+
+
+def peak_reading(path):
+    """(rows, peak traced bytes) reading `path` in importer-sized batches, as run_import does"""
+    tracemalloc.start()
+    try:
+        count, batch = 0, []
+        with open(path, 'rb') as f:
+            for row in iter_rows(f):
+                batch.append(row)
+                if len(batch) == IMPORT_CHUNK_SIZE:
+                    count, batch = count + len(batch), []
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return count + len(batch), peak
+
+
+class StreamingReaderTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def peaks(self, ext, writer, sizes):
+        peaks = []
+        for size in sizes:
+            path = os.path.join(self.tmp, f'guests_{size}{ext}')
+            writer(path, size)
+            count, peak = peak_reading(path)
+            self.assertEqual(count, size)
+            peaks.append(peak)
+        return peaks
+
+    def test_csv_memory_is_flat_in_file_size(self):
+        small, large = self.peaks('.csv', write_csv, (10000, 100000))
+        # Ten times the rows (a ~5 MB file) in the same memory
+        self.assertLess(large, small * 1.5)
+        self.assertLess(large, 1024 * 1024)
+
+    @unittest.skipUnless(HAS_OPENPYXL, 'openpyxl is not installed')
+    def test_xlsx_memory_grows_only_by_the_shared_strings(self):
+        small, large = self.peaks('.xlsx', write_xlsx, (1000, 10000))
+        # openpyxl's read-only mode keeps the workbook's shared-string table (three strings
+        # a row here) in memory; the rows themselves are streamed
+        self.assertLess(large - small, 9000 * 200)
+
+    def test_reads_every_row_with_row_numbers(self):
+        data = b'Full Name,Email,Phone Number\nAda,ada@example.com,0800\n,,\nGrace,grace@example.com,0801\n'
+        rows = list(iter_csv_rows(BytesIO(data)))
+        self.assertEqual([row[0] for row in rows], [2, 4])
+        self.assertEqual(rows[1][1:], ('Grace', 'grace@example.com', '0801'))
+
+    def test_empty_csv_is_rejected(self):
+        with self.assertRaises(ImportFileError):
+            iter_csv_rows(BytesIO(b''))
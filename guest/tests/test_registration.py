@@ -0,0 +1,142 @@
+import uuid
+from collections import Counter
+
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from guest.checkin import code_index
+from guest.checks import check_rate_limits
+from guest.models import Guest, Job
+from guest.ratelimit import parse_rate
+from guest.views import DuplicateRegistration, create_registration
+
+from .test_concurrency import run_concurrently
+
+DETAILS = {'full_name': 'Double Click', 'email': 'Double.Click@example.org', 'phone_number': '+1 555 0100'}
+
+
+class CreateRegistrationTests(TestCase):
+    def tearDown(self):
+        code_index.clear()
+
+    def test_repeats_return_the_first_registration(self):
+        guest, created = create_registration('Ada Lovelace', '0800 111', 'ada@example.com', 'a' * 32)
+        self.assertTrue(created)
+        for args in (
+            ('Ada Lovelace', '0800 111', 'ada@example.com', 'a' * 32),  # same form
+            ('Ada', '0800111', ' ADA@example.com ', 'b' * 32),  # same details, new form
+        ):
+            with self.subTest(args=args):
+                self.assertEqual(create_registration(*args), (guest, False))
+        self.assertEqual(Job.objects.filter(guest=guest).count(), 1)
+
+    def test_same_email_with_another_phone_is_refused(self):
+        create_registration('Ada Lovelace', '0800 111', 'ada@example.com')
+        with self.assertRaises(DuplicateRegistration):
+            create_registration('Ada Lovelace', '0800 999', 'ada@example.com')
+
+
+class RegisterViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        code_index.clear()
+
+    def test_resubmitted_form_redirects_to_its_success_page(self):
+        form = {**DETAILS, 'registration_token': uuid.uuid4().hex}
+        first = self.client.post('/', form)
+        again = self.client.post('/', form)
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(again['Location'], first['Location'])
+
+    def test_other_phone_for_registered_email_is_a_conflict(self):
+        self.client.post('/', DETAILS)
+        response = self.client.post('/', {**DETAILS, 'phone_number': '0800 000 0000'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Guest.objects.count(), 1)
+
+    @override_settings(RATELIMIT_REGISTER_PER_IP='20/m')
+    def test_per_ip_limit(self):
+        statuses = Counter(
+            self.client.post('/', {
+                'full_name': f'Flood {i}', 'email': f'flood{i}@example.org', 'phone_number': f'0700{i:07d}',
+            }, REMOTE_ADDR='10.3.0.1').status_code
+            for i in range(30)
+        )
+        self.assertEqual(statuses, {302: 20, 429: 10})
+
+    @override_settings(RATELIMIT_REGISTER_PER_EMAIL='5/h', RATELIMIT_REGISTER_PER_IP='')
+    def test_per_email_limit_stops_phone_guessing(self):
+        statuses = Counter(
+            self.client.post('/', {**DETAILS, 'phone_number': f'0600{i:07d}'}, REMOTE_ADDR=f'10.4.0.{i}').status_code
+            for i in range(10)
+        )
+        self.assertEqual(statuses, {302: 1, 409: 4, 429: 5})
+        response = self.client.post('/', {**DETAILS, 'phone_number': '0600 1'}, REMOTE_ADDR='10.4.1.1')
+        self.assertTrue(response.has_header('Retry-After'))
+
+
+class RateSettingTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('20/m'), (20, 60))
+        self.assertEqual(parse_rate('3'), (3, 1))
+        for disabled in ('', None, '0/h'):
+            self.assertIsNone(parse_rate(disabled))
+        for malformed in ('20/min', 'x/m', '-1/m', '20/m/h'):
+            with self.subTest(rate=malformed), self.assertRaises(ValueError):
+                parse_rate(malformed)
+
+    @override_settings(RATELIMIT_REGISTER_PER_IP='', RATELIMIT_REGISTER_PER_EMAIL='5/h')
+    def test_check_passes_valid_rates(self):
+        self.assertEqual(check_rate_limits(None), [])
+
+    @override_settings(RATELIMIT_REGISTER_PER_IP='20 per minute', RATELIMIT_REGISTER_PER_EMAIL='5/week')
+    def test_check_reports_each_malformed_rate(self):
+        errors = check_rate_limits(None)
+        self.assertEqual([error.id for error in errors], ['guest.E001', 'guest.E001'])
+        self.assertIn('RATELIMIT_REGISTER_PER_IP', errors[0].msg)
+        self.assertIn('RATELIMIT_REGISTER_PER_EMAIL', errors[1].msg)
+
+
+class ConcurrentRegistrationTests(TransactionTestCase):
+    """Simultaneous submissions against the configured database: one guest, one badge job"""
+
+    submissions = 12
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        code_index.clear()
+
+    def submit_all(self, forms):
+        ips = [f'10.1.0.{i}' for i in range(len(forms))]
+        return Counter(run_concurrently(lambda form, ip: Client().post('/', form, REMOTE_ADDR=ip).status_code, forms, ips))
+
+    def assertRegisteredOnce(self):
+        self.assertEqual(Guest.objects.filter(email_normalized='double.click@example.org').count(), 1)
+        self.assertEqual(Job.objects.filter(guest__email_normalized='double.click@example.org').count(), 1)
+
+    def test_same_form_submitted_at_once(self):
+        form = {**DETAILS, 'registration_token': uuid.uuid4().hex}
+        self.assertEqual(self.submit_all([form] * self.submissions), {302: self.submissions})
+        self.assertRegisteredOnce()
+
+    @override_settings(RATELIMIT_REGISTER_PER_EMAIL='')
+    def test_same_details_from_different_forms_at_once(self):
+        # Two tabs or a script: new tokens each time, so only the email and phone tie them together
+        forms = [
+            {**DETAILS, 'email': DETAILS['email'].upper(), 'registration_token': uuid.uuid4().hex}
+            for _ in range(self.submissions)
+        ]
+        self.assertEqual(self.submit_all(forms), {302: self.submissions})
+        self.assertRegisteredOnce()
+
+    @override_settings(RATELIMIT_REGISTER_PER_EMAIL='')
+    def test_same_email_with_different_phones_at_once(self):
+        forms = [{**DETAILS, 'phone_number': f'0600{i:07d}'} for i in range(self.submissions)]
+        self.assertEqual(self.submit_all(forms), {302: 1, 409: self.submissions - 1})
+        self.assertRegisteredOnce()
@@ -0,0 +1,116 @@
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+import qrcode
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from guest import badges, render_pool, rendering
+from guest.checkin import code_index
+from guest.models import Guest
+
+CODES = ['A1B2C3D4', 'ZZZZZZZZ', '00000000', 'Q7X9K2M4']
+
+
+def read_modules(image, modules, origin=(0, 0)):
+    """Sample the centre of every module of a QR drawn at `origin` back into a boolean matrix"""
+    gray = image.convert('L')
+    scale = badges.QR_BOX_SIZE / badges.QR_FACTOR
+    x0, y0 = origin
+    return [
+        [gray.getpixel((x0 + int((col + 0.5) * scale), y0 + int((row + 0.5) * scale))) < 128 for col in range(modules)]
+        for row in range(modules)
+    ]
+
+
+def golden_qr(code):
+    """The QR as qrcode's own image factory draws it, shrunk to badge size: the rendering before matrix drawing"""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H)
+    qr.add_data(code)
+    qr.make(fit=True)
+    image = qr.make_image(fill_color='black', back_color='white').convert('RGBA')
+    return image.resize((image.width // badges.QR_FACTOR, image.height // badges.QR_FACTOR))
+
+
+class QrRenderingTests(SimpleTestCase):
+    def test_badge_decodes_to_the_encoded_modules(self):
+        for code in CODES:
+            with self.subTest(code=code):
+                matrix = rendering.qr_matrix(code)
+                badge = Image.open(BytesIO(rendering.render_badge(code)))
+                size = rendering.qr_size(matrix)
+                origin = (badges.QR_MARGIN, badge.height - size - badges.QR_MARGIN)
+                self.assertEqual(read_modules(badge, len(matrix), origin), matrix)
+
+    def test_matrix_qr_matches_the_golden_image(self):
+        for code in CODES:
+            with self.subTest(code=code):
+                matrix = rendering.qr_matrix(code)
+                golden = golden_qr(code)
+                qr = rendering.make_qr_image(code)
+                self.assertEqual(qr.size, golden.size)
+                self.assertEqual(read_modules(qr, len(matrix)), read_modules(golden, len(matrix)))
+
+    def test_png_settings_keep_the_pixels(self):
+        badge = rendering.render_badge_image(CODES[0])
+        expected = badge.convert('RGB').tobytes()
+        for level, optimize in ((1, False), (9, True)):
+            with self.subTest(level=level, optimize=optimize):
+                with override_settings(BADGE_PNG_COMPRESS_LEVEL=level, BADGE_PNG_OPTIMIZE=optimize):
+                    png = rendering.encode_png(badge)
+                self.assertEqual(Image.open(BytesIO(png)).convert('RGB').tobytes(), expected)
+
+    @override_settings(BADGE_PNG_PALETTE=True)
+    def test_palette_png_still_decodes(self):
+        code = CODES[1]
+        matrix = rendering.qr_matrix(code)
+        badge = Image.open(BytesIO(rendering.render_badge(code)))
+        self.assertEqual(badge.mode, 'P')
+        origin = (badges.QR_MARGIN, badge.height - rendering.qr_size(matrix) - badges.QR_MARGIN)
+        self.assertEqual(read_modules(badge, len(matrix), origin), matrix)
+
+    def test_badge_files_are_png_and_webp(self):
+        png, thumbnail, webp = rendering.render_badge_files(CODES[2])
+        self.assertEqual(Image.open(BytesIO(png)).format, 'PNG')
+        self.assertEqual(Image.open(BytesIO(thumbnail)).format, 'PNG')
+        self.assertEqual(Image.open(BytesIO(webp)).format, 'WEBP')
+        self.assertLessEqual(max(Image.open(BytesIO(webp)).size), max(badges.THUMBNAIL_SIZE))
+
+
+class RenderPoolTests(SimpleTestCase):
+    def test_pool_renders_the_same_bytes_as_this_process(self):
+        self.addCleanup(render_pool.shutdown)
+        results = list(render_pool.render_many(CODES, workers=2))
+        self.assertEqual([code for code, _, _ in results], CODES)
+        for code, files, error in results:
+            with self.subTest(code=code):
+                self.assertIsNone(error)
+                self.assertEqual(files, rendering.render_badge_files(code))
+
+
+class RenderStaleTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.addCleanup(code_index.clear)
+
+    def test_each_badge_is_stored_as_it_arrives(self):
+        guests = [
+            Guest.objects.create(full_name=f'Guest {i}', email=f'guest{i}@example.com', phone_number=f'0800{i}')
+            for i in range(3)
+        ]
+        stored_before = []
+
+        def render_many(codes, workers=None):
+            for code in codes:
+                # What was already stored when the pool hands over this badge
+                stored_before.append(Guest.objects.exclude(badge_hash='').count())
+                yield code, (b'png', b'thumb', b'webp'), None
+
+        with mock.patch.object(render_pool, 'render_many', render_many):
+            self.assertEqual(render_pool.render_stale(guests), (3, 0))
+        self.assertEqual(stored_before, [0, 1, 2])
@@ -0,0 +1,179 @@
+import csv
+import logging
+import tempfile
+import unittest
+from io import BytesIO, StringIO
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from guest import jobs, stats
+from guest.checkin import code_index
+from guest.exports import HAS_OPENPYXL
+from guest.importer import IMPORT_CHUNK_SIZE
+from guest.models import Guest, GuestImport, Job
+
+from .test_importer import csv_upload
+
+
+def seed(count, start=0):
+    guests = [
+        Guest(
+            full_name=f'Guest {i}', email=f'guest{i}@example.com', phone_number=f'0800{i:07d}', qr_code_value=f'{i:08X}',
+        )
+        for i in range(start, start + count)
+    ]
+    for guest in guests:
+        guest.normalize()
+    Guest.objects.bulk_create(guests)
+
+
+class RequestTestCase(TestCase):
+    """Each request path end to end, and its query count with few guests and with ten times as many"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        # Keep guest.performance's line per request and job out of the test output
+        logger = logging.getLogger('guest')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.WARNING)
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        code_index.clear()
+
+    def grow_to(self, count):
+        seed(count - Guest.objects.count(), start=Guest.objects.count())
+        # bulk_create skips the signals that keep the statistics current
+        with self.assertLogs('guest.stats', 'WARNING'):
+            stats.reconcile()
+
+    def queries(self, func, *args):
+        with CaptureQueriesContext(connection) as queries:
+            func(*args)
+        return len(queries)
+
+    def assertQueriesFlat(self, func, sizes=(20, 200)):
+        """func(i) runs the same number of queries whether there are sizes[0] or sizes[1] guests"""
+        counts = []
+        for i, size in enumerate(sizes):
+            self.grow_to(size)
+            counts.append(self.queries(func, i))
+        self.assertEqual(counts[0], counts[1], f'queries grew with the guest count: {counts}')
+        return counts[0]
+
+
+class RegisterRequestTests(RequestTestCase):
+    def register(self, i):
+        response = self.client.post('/', {
+            'full_name': f'New Guest {i}', 'email': f'new{i}@example.org', 'phone_number': f'0900{i:07d}',
+        }, REMOTE_ADDR=f'10.5.0.{i}')
+        guest = Guest.objects.get(email_normalized=f'new{i}@example.org')
+        self.assertRedirects(response, f'/success/{guest.qr_code_value}/', fetch_redirect_response=False)
+
+    def test_register_queries_do_not_grow_with_guests(self):
+        self.assertLessEqual(self.assertQueriesFlat(self.register), 15)
+
+    def test_worker_sends_one_badge_per_registration(self):
+        for i in range(3):
+            self.register(i)
+        while jobs.run_pending():
+            pass
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'new{i}@example.org' for i in range(3)])
+        self.assertEqual(set(Guest.objects.values_list('badge_status', flat=True)), {Guest.BADGE_SENT})
+
+
+class SuccessRequestTests(RequestTestCase):
+    def test_success_page(self):
+        def load(i):
+            guest = Guest.objects.order_by('-pk').first()
+            self.assertContains(self.client.get(f'/success/{guest.qr_code_value}/'), guest.full_name)
+
+        self.assertLessEqual(self.assertQueriesFlat(load), 2)
+
+    def test_unknown_code_is_not_found(self):
+        self.assertEqual(self.client.get('/success/NOPE0000/').status_code, 404)
+
+
+class DashboardRequestTests(RequestTestCase):
+    def test_dashboard(self):
+        def load(i):
+            self.assertEqual(self.client.get('/dashboard/').status_code, 200)
+
+        self.assertLessEqual(self.assertQueriesFlat(load), 4)
+
+    def test_dashboard_data(self):
+        def load(i):
+            page = self.client.get('/dashboard/data/', {'draw': 1, 'start': 10, 'length': 10}).json()
+            self.assertEqual((page['recordsTotal'], len(page['data'])), (Guest.objects.count(), 10))
+
+        self.assertLessEqual(self.assertQueriesFlat(load), 3)
+
+    def test_dashboard_stats(self):
+        def load(i):
+            self.assertEqual(self.client.get('/dashboard/stats/').json()['guests'], Guest.objects.count())
+
+        self.assertQueriesFlat(load)
+
+
+class ExportRequestTests(RequestTestCase):
+    def test_csv_export_streams_every_guest(self):
+        def export(i):
+            response = self.client.get('/export/csv/')
+            self.assertTrue(response.streaming)
+            rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+            self.assertEqual(rows[0], ['Full Name', 'Email', 'Phone Number', 'QR Code'])
+            self.assertEqual(len(rows) - 1, Guest.objects.count())
+
+        # Under EXPORT_CHUNK_SIZE guests, one query fetches them all
+        self.assertQueriesFlat(export)
+
+    @unittest.skipUnless(HAS_OPENPYXL, 'openpyxl is not installed')
+    def test_xlsx_export_has_every_guest(self):
+        import openpyxl
+
+        def export(i):
+            response = self.client.get('/export/xlsx/')
+            self.assertTrue(response.streaming)
+            sheet = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+            self.assertEqual(sum(1 for _ in sheet.iter_rows()) - 1, Guest.objects.count())
+
+        self.assertQueriesFlat(export)
+
+
+class ImportRequestTests(RequestTestCase):
+    def test_import_runs_in_the_worker(self):
+        def upload(i):
+            response = self.client.post('/import/', {'file': csv_upload(50, start=100000 * (i + 1))})
+            guest_import = GuestImport.objects.latest('pk')
+            self.assertRedirects(response, f'/dashboard/?import={guest_import.pk}', fetch_redirect_response=False)
+
+        self.assertQueriesFlat(upload)
+
+    def test_import_queries_follow_chunks_not_rows(self):
+        counts = []
+        # The first file creates the statistics rows; then one chunk, then three
+        for i, rows in enumerate((10, IMPORT_CHUNK_SIZE, 3 * IMPORT_CHUNK_SIZE)):
+            # The previous import's badge renders would be claimed first
+            Job.objects.filter(kind=Job.RENDER_BADGE).delete()
+            self.client.post('/import/', {'file': csv_upload(rows, start=100000 * (i + 1))})
+            counts.append(self.queries(jobs.run_pending, 1))
+            guest_import = GuestImport.objects.latest('pk')
+            self.assertEqual((guest_import.status, guest_import.imported), (GuestImport.DONE, rows))
+        _, one_chunk, three_chunks = counts
+        self.assertLess(one_chunk, IMPORT_CHUNK_SIZE // 10)
+        self.assertLessEqual(three_chunks, 3 * one_chunk)
+
+    def test_unsupported_file_is_refused(self):
+        response = self.client.post('/import/', {'file': SimpleUploadedFile('guests.txt', b'hello')})
+        self.assertRedirects(response, '/dashboard/', fetch_redirect_response=False)
+        self.assertFalse(GuestImport.objects.exists())
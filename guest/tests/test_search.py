@@ -0,0 +1,47 @@
+import unittest
+
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from guest import search
+from guest.models import Guest
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Guest.objects.create(full_name='Ada Lovelace', email='ada@example.com', phone_number='0800 111 2222')
+        Guest.objects.create(full_name='Grace Hopper', email='grace@example.org', phone_number='0800 333 4444')
+
+    def test_matches_any_field(self):
+        for term, name in (('lovel', 'Ada Lovelace'), ('example.org', 'Grace Hopper'), ('333', 'Grace Hopper')):
+            with self.subTest(term=term):
+                names = list(search.search_guests(Guest.objects.all(), term).values_list('full_name', flat=True))
+                self.assertEqual(names, [name])
+
+    def test_short_terms_fall_back_to_like(self):
+        self.assertEqual(search.search_guests(Guest.objects.all(), 'Ho').count(), 1)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite FTS index')
+class SqliteFtsRestoreTests(TransactionTestCase):
+    def tearDown(self):
+        search._backend = None
+
+    def test_post_migrate_reinstalls_dropped_index(self):
+        with connection.schema_editor() as schema_editor:
+            # What a later migration's table rebuild leaves behind
+            schema_editor.execute(f"DROP TRIGGER {search.FTS_TABLE}_au")
+        self.assertFalse(search.sqlite_fts_installed(connection))
+
+        with self.assertLogs('guest.search', 'INFO'):
+            emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+
+        self.assertTrue(search.sqlite_fts_installed(connection))
+        Guest.objects.create(full_name='Katherine Johnson', email='kj@example.com', phone_number='0800 555')
+        self.assertIsInstance(search.get_search_backend(), search.SqliteFtsSearch)
+        self.assertEqual(search.search_guests(Guest.objects.all(), 'Johnson').count(), 1)
+
+    def test_post_migrate_leaves_installed_index_alone(self):
+        self.assertFalse(search.ensure_search_indexes(connection.alias))
@@ -0,0 +1,168 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+
+from guest import stats
+from guest.checkin import code_index
+from guest.models import DailyStat, Guest, StatCounter
+
+
+def guest(name, **fields):
+    return Guest.objects.create(
+        full_name=name, email=f'{name.split()[0].lower()}@example.com', phone_number='0800', **fields,
+    )
+
+
+def daily(name):
+    return dict(DailyStat.objects.filter(name=name).exclude(value=0).values_list('day', 'value'))
+
+
+class StatsTestCase(TestCase):
+    def tearDown(self):
+        code_index.clear()
+
+    def assertConsistent(self):
+        """The running figures match a recount from the guest rows"""
+        with self.assertNoLogs('guest.stats', 'WARNING'):
+            self.assertEqual(stats.reconcile(), {})
+
+
+class GuestSavedTests(StatsTestCase):
+    def test_create_counts_the_guest(self):
+        guest('Ada Lovelace')
+        guest('Grace Hopper', source=Guest.SOURCE_IMPORT)
+
+        self.assertEqual(stats.counter(stats.GUESTS), 2)
+        self.assertEqual(stats.counter(stats.badge_counter(Guest.BADGE_PENDING)), 2)
+        self.assertEqual(stats.counter(stats.source_counter(Guest.SOURCE_IMPORT)), 1)
+        today = timezone.localdate()
+        self.assertEqual(daily(stats.REGISTRATIONS), {today: 2})
+        self.assertEqual(daily(stats.IMPORTED), {today: 1})
+        self.assertConsistent()
+
+    def test_update_moves_counts_between_statuses(self):
+        ada = guest('Ada Lovelace')
+        ada.badge_status = Guest.BADGE_SENT
+        ada.checked_in_at = timezone.now()
+        ada.save()
+
+        self.assertEqual(stats.counter(stats.badge_counter(Guest.BADGE_PENDING)), 0)
+        self.assertEqual(stats.counter(stats.badge_counter(Guest.BADGE_SENT)), 1)
+        self.assertEqual(stats.counter(stats.CHECKED_IN), 1)
+        self.assertEqual(daily(stats.CHECK_INS), {timezone.localdate(): 1})
+        self.assertConsistent()
+
+    def test_update_fields_only_touches_what_was_written(self):
+        ada = guest('Ada Lovelace')
+        ada.badge_status = Guest.BADGE_READY
+        ada.save(update_fields=['badge_status'])
+        self.assertEqual(stats.counter(stats.badge_counter(Guest.BADGE_READY)), 1)
+        self.assertEqual(stats.counter(stats.GUESTS), 1)
+        self.assertConsistent()
+
+    def test_changed_day_moves_the_rollup(self):
+        ada = guest('Ada Lovelace', checked_in_at=timezone.now())
+        earlier = timezone.now() - timedelta(days=3)
+        ada.created_at = earlier
+        ada.checked_in_at = earlier
+        ada.save()
+
+        self.assertEqual(daily(stats.REGISTRATIONS), {timezone.localdate(earlier): 1})
+        self.assertEqual(daily(stats.CHECK_INS), {timezone.localdate(earlier): 1})
+        self.assertConsistent()
+
+    def test_delete_takes_the_guest_away(self):
+        ada = guest('Ada Lovelace', checked_in_at=timezone.now())
+        guest('Grace Hopper')
+        ada.delete()
+
+        self.assertEqual(stats.counter(stats.GUESTS), 1)
+        self.assertEqual(stats.counter(stats.CHECKED_IN), 0)
+        self.assertEqual(daily(stats.CHECK_INS), {})
+        self.assertConsistent()
+
+    def test_deferred_save_is_left_to_reconcile(self):
+        ada = guest('Ada Lovelace')
+        deferred = Guest.objects.only('pk', 'qr_code_value').get(pk=ada.pk)
+        deferred.badge_status = Guest.BADGE_SENT
+        with self.assertNumQueries(1):
+            deferred.save(update_fields=['badge_status'])
+
+        self.assertEqual(stats.counter(stats.badge_counter(Guest.BADGE_PENDING)), 1)
+        with self.assertLogs('guest.stats', 'WARNING'):
+            self.assertEqual(stats.reconcile(), {'badge_pending': -1, 'badge_sent': 1})
+        self.assertEqual(stats.counter(stats.badge_counter(Guest.BADGE_SENT)), 1)
+
+
+class RecordTests(StatsTestCase):
+    def test_pairs_that_cancel_write_nothing(self):
+        state = {'badge_status': Guest.BADGE_PENDING}
+        with self.assertNumQueries(0):
+            stats.record([(state, state), (None, None)])
+
+    def test_delta_survives_a_row_rebuilt_mid_update(self):
+        guest('Ada Lovelace')
+        update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            if queryset.model is StatCounter and not raced:
+                raced.append(True)
+                # reconcile() drops the row and recreates it from rows that don't include this change yet
+                StatCounter.objects.filter(name=stats.GUESTS).delete()
+                result = update(queryset, **kwargs)
+                StatCounter.objects.create(name=stats.GUESTS, value=1)
+                return result
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            guest('Grace Hopper')
+
+        self.assertTrue(raced)
+        self.assertEqual(stats.counter(stats.GUESTS), 2)
+        self.assertConsistent()
+
+
+class SnapshotTests(StatsTestCase):
+    def test_figures_and_series(self):
+        guest('Ada Lovelace', checked_in_at=timezone.now())
+        guest('Grace Hopper', badge_status=Guest.BADGE_FAILED)
+        guest('Alan Turing', badge_status=Guest.BADGE_READY, source=Guest.SOURCE_IMPORT)
+        guest('Old Guest', created_at=timezone.now() - timedelta(days=40))
+
+        with self.assertNumQueries(2):
+            figures = stats.snapshot(days=7)
+
+        self.assertEqual((figures['guests'], figures['checked_in'], figures['check_in_rate']), (4, 1, 25.0))
+        self.assertEqual((figures['emails_pending'], figures['emails_failed']), (3, 1))
+        self.assertEqual(figures['sources'], {Guest.SOURCE_FORM: 3, Guest.SOURCE_IMPORT: 1})
+        self.assertEqual(len(figures['daily']['days']), 7)
+        self.assertEqual(figures['daily']['days'][-1], timezone.localdate().isoformat())
+        # The 40-day-old registration is outside the window
+        self.assertEqual(figures['daily'][stats.REGISTRATIONS], [0] * 6 + [3])
+        self.assertEqual(figures['daily'][stats.IMPORTED][-1], 1)
+        self.assertEqual(figures['daily'][stats.CHECK_INS][-1], 1)
+
+    def test_empty(self):
+        figures = stats.snapshot()
+        self.assertEqual((figures['guests'], figures['check_in_rate']), (0, 0.0))
+
+
+class ReconcileTests(StatsTestCase):
+    def test_corrects_writes_that_bypass_the_signals(self):
+        ada = guest('Ada Lovelace')
+        Guest.objects.filter(pk=ada.pk).update(checked_in_at=timezone.now())
+        Guest.objects.bulk_create([Guest(full_name='Bulk', email='bulk@example.com', phone_number='0800', qr_code_value='BULK0001')])
+
+        with self.assertLogs('guest.stats', 'WARNING'):
+            drift = stats.reconcile()
+        today = timezone.localdate().isoformat()
+        self.assertEqual(drift, {
+            stats.GUESTS: 1, stats.CHECKED_IN: 1, 'badge_pending': 1, 'source_form': 1,
+            f'registrations:{today}': 1, f'check_ins:{today}': 1,
+        })
+        self.assertEqual(stats.counter(stats.GUESTS), 2)
+        self.assertConsistent()
@@ -1,11 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    register, success, checkin = views.aregister, views.asuccess, views.acheckin
+else:
+    register, success, checkin = views.register, views.success, views.checkin
+
 urlpatterns = [
-    path('', views.register, name="register"),
-    path('success/<str:code>/', views.success, name="success"),
+    path('', register, name="register"),
+    path('success/<str:code>/', success, name="success"),
+    path('badge/<str:code>/', views.badge, name="badge"),
+    path('badge/<str:code>/thumb/', views.badge_thumbnail, name="badge_thumbnail"),
     path('dashboard/', views.dashboard, name="dashboard"),
+    path('dashboard/data/', views.dashboard_data, name="dashboard_data"),
+    path('dashboard/stats/', views.dashboard_stats, name="dashboard_stats"),
+    path('dashboard/guest/<str:code>/', views.guest_detail, name="guest_detail"),
     path('export/csv/', views.export_csv, name="export_csv"),
     path('export/xlsx/', views.export_xlsx, name="export_xlsx"),
     path('import/', views.import_guests, name="import_guests"),
+    path('import/<int:pk>/', views.import_status, name="import_status"),
+    path('import/<int:pk>/errors.csv', views.import_errors, name="import_errors"),
+    path('checkin/manifest/', views.checkin_manifest, name="checkin_manifest"),
+    path('checkin/batch/', views.checkin_batch, name="checkin_batch"),
+    path('checkin/<str:code>/', checkin, name="checkin"),
+    path('metrics/', views.metrics, name="metrics"),
 ]
@@ -1,182 +1,411 @@
-import os
 import csv
+import hashlib
+import hmac
+import json
+import logging
+import math
+import re
+import uuid
 from datetime import datetime
-from django.conf import settings
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
 from django.contrib import messages
-import qrcode
-from PIL import Image
-from io import BytesIO, StringIO
-from django.core.files.base import ContentFile
-from django.shortcuts import render, redirect
-from .models import Guest
-from django.core.mail import EmailMessage
 from django.conf import settings
-from io import BytesIO
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, render, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST, require_safe
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from . import ratelimit, stats
+from .models import Guest, GuestImport, Job, normalize_email, normalize_phone
+from .jobs import enqueue
+from .importer import start_import
+from .readers import is_supported
+from .exports import EXPORT_CHUNK_SIZE, HAS_OPENPYXL, Echo, stream_csv, xlsx_response
+from .filters import filter_guests
+from .search import search_guests
+from .badges import badge_thumbnail_url, ensure_badge
+from .media import badge_file_response
+from .caching import LIST_TIMEOUT, PENDING_PAGE_TIMEOUT, SUCCESS_PAGE_TIMEOUT, list_key, page_cache, success_key
+from .checkin import MAX_BATCH_SCANS, acheck_in, apply_scans, build_manifest, check_in, manifest_version
+from .metrics import render_prometheus
+
+logger = logging.getLogger(__name__)
+
+REGISTRATION_TOKEN = re.compile(r'[0-9a-f]{32}')
+
+class DuplicateRegistration(Exception):
+    """The email address is already registered with a different phone number"""
+
+
+def _lock_email(email_key):
+    """
+    Hold back other registrations of `email_key` until this transaction ends.
+    SQLite's IMMEDIATE transactions already run writers one at a time; under
+    PostgreSQL's READ COMMITTED two of them would each find no match and both
+    insert, so they queue on an advisory lock keyed by the address.
+    """
+    if connection.vendor == 'postgresql' and email_key:
+        digest = hashlib.blake2b(email_key.encode(), digest_size=8, person=b'reunion-reg').digest()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [int.from_bytes(digest, 'big', signed=True)])
+
+
+def create_registration(full_name, phone_number, email, token=''):
+    """
+    Register a guest, or find the registration this submission repeats.
+
+    A repeat carries the same form token (a double-click or browser retry) or
+    the same normalized email and phone. It returns the existing guest without
+    queueing another badge or email. The same email with a different phone
+    raises DuplicateRegistration. Returns (guest, created).
+    """
+    email_key, phone_key = normalize_email(email), normalize_phone(phone_number)
+    lookup = Q(registration_token=token) if token else Q()
+    if email_key:
+        lookup |= Q(email_normalized=email_key)
+
+    # Submissions of one address are checked one at a time; the token's unique
+    # constraint also stops a retried form without an email creating a second guest
+    with transaction.atomic():
+        _lock_email(email_key)
+        matches = list(Guest.objects.filter(lookup).order_by('pk')) if lookup else []
+        if matches:
+            same_form = [guest for guest in matches if token and guest.registration_token == token]
+            same_details = [
+                guest for guest in matches
+                if guest.email_normalized == email_key and guest.phone_normalized == phone_key
+            ]
+            if not same_form and not same_details:
+                raise DuplicateRegistration(email)
+            return (same_form or same_details)[0], False
+
+        try:
+            with transaction.atomic():
+                guest = Guest.objects.create(
+                    full_name=full_name,
+                    phone_number=phone_number,
+                    email=email,
+                    registration_token=token,
+                )
+        except IntegrityError:
+            if not token:
+                raise
+            # A concurrent submission of the same form won the insert
+            return Guest.objects.get(registration_token=token), False
+
+        # Badge rendering and the confirmation email happen in the worker
+        enqueue(Job.SEND_BADGE, guest=guest)
+    return guest, True
+
+
+def _form_token(request):
+    token = request.POST.get("registration_token", "")
+    return token if REGISTRATION_TOKEN.fullmatch(token) else ""
+
+
+def _submission_key(request, token):
+    """Identifies a form's resubmissions (same token, email and phone), which count once against the email's limit"""
+    if not token:
+        return None
+    return f'{token}:{normalize_email(request.POST.get("email"))}:{normalize_phone(request.POST.get("phone_number"))}'
+
+
+def _registration_form(request, error=None, status=200, retry_after=0):
+    """The form with a fresh idempotency token; on errors the submitted values are kept"""
+    context = {
+        "registration_token": uuid.uuid4().hex,
+        "error": error,
+        "values": request.POST if error else {},
+    }
+    response = render(request, "register.html", context, status=status)
+    if retry_after:
+        response["Retry-After"] = str(math.ceil(retry_after))
+    return response
+
+
+def _rate_limited(request, retry_after):
+    return _registration_form(
+        request, "Too many registration attempts. Please wait a moment and try again.",
+        status=429, retry_after=retry_after,
+    )
+
+
+def _duplicate(request):
+    return _registration_form(
+        request, "This email address is already registered with a different phone number.", status=409,
+    )
 
-try:
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment
-    HAS_OPENPYXL = True
-except ImportError:
-    HAS_OPENPYXL = False
 
 def register(request):
     if request.method == "POST":
-        full_name = request.POST.get("full_name")
-        phone_number = request.POST.get("phone_number")
-        email = request.POST.get("email")
-
-        # Save guest
-        guest = Guest.objects.create(
-            full_name=full_name,
-            phone_number=phone_number,
-            email=email
+        retry_after = ratelimit.register_per_ip.hit(ratelimit.client_ip(request))
+        if retry_after:
+            return _rate_limited(request, retry_after)
+        token = _form_token(request)
+        # A resubmitted form goes straight back to its success page, without spending the email's budget
+        repeat = Guest.objects.filter(registration_token=token).first() if token else None
+        if repeat:
+            return redirect("success", code=repeat.qr_code_value)
+        # Limits guessing at the phone number of an already registered email
+        retry_after = ratelimit.register_per_email.hit(
+            normalize_email(request.POST.get("email")), once_per=_submission_key(request, token),
         )
+        if retry_after:
+            return _rate_limited(request, retry_after)
+        try:
+            guest, _ = create_registration(
+                request.POST.get("full_name"),
+                request.POST.get("phone_number"),
+                request.POST.get("email"),
+                token,
+            )
+        except DuplicateRegistration:
+            return _duplicate(request)
+        return redirect("success", code=guest.qr_code_value)
 
-        # Generate QR code
-        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H)
-        qr.add_data(guest.qr_code_value)
-        qr.make(fit=True)
-        qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGBA")
-
-        # Open event logo
-        logo_path = os.path.join(settings.BASE_DIR, "guest", "static", "images", "event-logo.jpg")
-        logo = Image.open(logo_path).convert("RGBA")
-        logo_width, logo_height = logo.size
-
-        # Resize QR to fit nicely
-        qr_width, qr_height = qr_img.size
-        factor = 4  # smaller QR
-        qr_img = qr_img.resize((qr_width//factor, qr_height//factor))
-
-        # Paste QR at bottom left
-        position = (10, logo_height - qr_img.height - 10)
-        logo.paste(qr_img, position, qr_img)
-
-        # Save final image
-        buffer = BytesIO()
-        logo.save(buffer, format="PNG")
-        guest.qr_image.save(f"{guest.qr_code_value}.png", ContentFile(buffer.getvalue()))
-        
-        # --- SEND EMAIL WITH QR ---
+    return _registration_form(request)
 
-        subject = "Class of 2016 Homecoming Registration Confirmation"
 
-        message = f"""
-        Hello {guest.full_name},
+def _success_page(guest):
+    """Rendered success page with its validators, as stored in the cache"""
+    html = render_to_string("success.html", {"guest": guest})
+    return {
+        'html': html,
+        'etag': f'"{hashlib.md5(html.encode()).hexdigest()}"',
+        'last_modified': guest.updated_at.timestamp(),
+        'pending': not guest.qr_image and guest.badge_status == Guest.BADGE_PENDING,
+    }
 
-        Thank you for registering.
 
-        Your QR code is attached to this email.
-        Please keep it safe as it will be required for check-in.
+def _page_response(request, page):
+    # 304 when the browser's copy is current
+    response = get_conditional_response(request, etag=page['etag'], last_modified=page['last_modified'])
+    if response is None:
+        response = HttpResponse(page['html'])
+    response['ETag'] = page['etag']
+    response['Last-Modified'] = http_date(page['last_modified'])
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
-        Regards,
-        Reunion Committee
-        """
 
-        email = EmailMessage(
-        subject,
-        message,
-        settings.EMAIL_HOST_USER,
-        [guest.email]
-        )
+def _page_timeout(page):
+    return PENDING_PAGE_TIMEOUT if page['pending'] else SUCCESS_PAGE_TIMEOUT
 
-        email.attach_file(guest.qr_image.path)
-        email.send()
 
+def success(request, code):
+    """Guests reload and share this page a lot, so it is cached per code until the guest changes"""
+    cache = page_cache()
+    page = cache.get(success_key(code))
+    if page is None:
+        guest = get_object_or_404(Guest, qr_code_value=code)
+        page = _success_page(guest)
+        cache.set(success_key(code), page, _page_timeout(page))
+    return _page_response(request, page)
+
+
+# ---------------------------
+# ASYNC VIEWS (ASYNC_VIEWS=True, served by the uvicorn profile)
+# ---------------------------
 
+async def aregister(request):
+    if request.method == "POST":
+        retry_after = await ratelimit.register_per_ip.ahit(ratelimit.client_ip(request))
+        if retry_after:
+            return _rate_limited(request, retry_after)
+        token = _form_token(request)
+        repeat = await Guest.objects.filter(registration_token=token).afirst() if token else None
+        if repeat:
+            return redirect("success", code=repeat.qr_code_value)
+        retry_after = await ratelimit.register_per_email.ahit(
+            normalize_email(request.POST.get("email")), once_per=_submission_key(request, token),
+        )
+        if retry_after:
+            return _rate_limited(request, retry_after)
+        try:
+            # The async ORM has no transactions, so the atomic create runs in a thread
+            guest, _ = await sync_to_async(create_registration)(
+                request.POST.get("full_name"),
+                request.POST.get("phone_number"),
+                request.POST.get("email"),
+                token,
+            )
+        except DuplicateRegistration:
+            return _duplicate(request)
         return redirect("success", code=guest.qr_code_value)
 
-    return render(request, "register.html")
+    return _registration_form(request)
 
 
+async def asuccess(request, code):
+    cache = page_cache()
+    page = await cache.aget(success_key(code))
+    if page is None:
+        guest = await aget_object_or_404(Guest, qr_code_value=code)
+        page = _success_page(guest)
+        await cache.aset(success_key(code), page, _page_timeout(page))
+    return _page_response(request, page)
+
+
+@csrf_exempt
+@require_POST
+async def acheckin(request, code):
+    if denied := _scanner_denied(request):
+        return denied
+    result = await acheck_in(code.strip().upper())
+    if result is None:
+        return JsonResponse({'code': code, 'error': 'Unknown code'}, status=404)
+    return JsonResponse(result)
+
+
+def badge(request, code):
+    """Guest's badge image, rendered on first request or when stale"""
+    guest = get_object_or_404(Guest, qr_code_value=code)
+    ensure_badge(guest)
+    return redirect(guest.qr_image.url)
 
-def success(request, code):
-    guest = Guest.objects.get(qr_code_value=code)
-    return render(request, "success.html", {"guest": guest})
+
+def badge_thumbnail(request, code):
+    guest = get_object_or_404(Guest, qr_code_value=code)
+    ensure_badge(guest)
+    return redirect(badge_thumbnail_url(guest))
+
+
+@require_safe
+def badge_media(request, name):
+    """Badge files under MEDIA_URL; hashed names are served as immutable"""
+    return badge_file_response(request, name)
 
 
 def dashboard(request):
-    guests = Guest.objects.all().order_by('-id')
-    total_guests = guests.count()
+    # Rows are fetched page by page from dashboard_data; the figures come precomputed from guest.stats
+    imports = GuestImport.objects.order_by('-pk')
+    import_id = _int_param(request.GET, 'import', 0)
+    active_import = (
+        imports.filter(pk=import_id).first() if import_id
+        else imports.filter(status__in=[GuestImport.QUEUED, GuestImport.RUNNING]).first()
+    )
+    figures = stats.snapshot()
     context = {
-        'guests': guests,
-        'total_guests': total_guests,
+        'total_guests': figures['guests'],
+        'stats': figures,
+        'active_import': active_import,
     }
     return render(request, "dashboard.html", context)
 
 
-def export_csv(request):
-    """Export all guests to CSV format"""
-    guests = Guest.objects.all().order_by('-id')
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="guests_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Full Name', 'Email', 'Phone Number', 'QR Code'])
-    
-    for guest in guests:
-        writer.writerow([guest.full_name, guest.email, guest.phone_number, guest.qr_code_value])
-    
+@require_GET
+def dashboard_stats(request):
+    """Dashboard figures and daily series, polled by the dashboard's charts"""
+    days = min(max(_int_param(request.GET, 'days', stats.CHART_DAYS), 1), 366)
+    response = JsonResponse(stats.snapshot(days))
+    response['Cache-Control'] = 'no-cache'
     return response
 
 
+# DataTables column index -> model field used for ordering
+DASHBOARD_COLUMNS = ['id', 'full_name', 'email', 'phone_number', None, 'qr_code_value', None]
+DASHBOARD_MAX_PAGE = 100
+
+
+def _int_param(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _guest_json(guest):
+    return {
+        'id': guest.id,
+        'full_name': guest.full_name,
+        'email': guest.email,
+        'phone_number': guest.phone_number,
+        'qr_code_value': guest.qr_code_value,
+        'qr_image': guest.qr_image.url if guest.qr_image else None,
+        'qr_thumbnail': badge_thumbnail_url(guest) or reverse('badge_thumbnail', args=[guest.qr_code_value]),
+        'badge_status': guest.badge_status,
+        'checked_in_at': guest.checked_in_at,
+    }
+
+
+def dashboard_data(request):
+    """Server-side processing endpoint for the dashboard's DataTables guest list"""
+    params = request.GET
+    draw = _int_param(params, 'draw', 0)
+    start = max(_int_param(params, 'start', 0), 0)
+    length = _int_param(params, 'length', 25)
+    if length <= 0 or length > DASHBOARD_MAX_PAGE:
+        length = DASHBOARD_MAX_PAGE
+
+    # Responses are cached per query; draw only echoes the request and _ busts browser caches
+    key = list_key([(name, value) for name, value in params.items() if name not in ('draw', '_')])
+    cache = page_cache()
+    payload = cache.get(key)
+    if payload is None:
+        payload = _dashboard_page(params, start, length)
+        cache.set(key, payload, LIST_TIMEOUT)
+    return JsonResponse({'draw': draw, **payload})
+
+
+def _dashboard_page(params, start, length):
+    guests = Guest.objects.all()
+    # Kept exact by guest.stats in the same transaction as every insert and delete
+    records_total = stats.counter(stats.GUESTS)
+
+    search = (params.get('search[value]') or '').strip()
+    if search:
+        guests = search_guests(guests, search)
+        records_filtered = guests.count()
+    else:
+        records_filtered = records_total
+
+    column = _int_param(params, 'order[0][column]', 0)
+    field = DASHBOARD_COLUMNS[column] if 0 <= column < len(DASHBOARD_COLUMNS) else None
+    field = field or 'id'
+    direction = '-' if params.get('order[0][dir]', 'desc') == 'desc' else ''
+    # id as a tie-breaker keeps paging stable when the sort column has duplicates
+    guests = guests.order_by(f'{direction}{field}', f'{direction}id')
+
+    page = guests.only(
+        'id', 'full_name', 'email', 'phone_number', 'qr_code_value', 'qr_image', 'badge_hash', 'badge_status', 'checked_in_at'
+    )[start:start + length]
+
+    return {
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': [_guest_json(guest) for guest in page],
+    }
+
+
+def guest_detail(request, code):
+    """Guest details for the dashboard's shared modal"""
+    guest = get_object_or_404(Guest, qr_code_value=code)
+    return JsonResponse(_guest_json(guest))
+
+
+def export_csv(request):
+    """Export guests to CSV format, streamed row by row; accepts the filter_guests() parameters"""
+    guests = filter_guests(Guest.objects.all(), request.GET).order_by('-id')
+    return stream_csv(guests, f'guests_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
+
+
 def export_xlsx(request):
-    """Export all guests to XLSX format"""
+    """Export guests to XLSX format; accepts the filter_guests() parameters"""
     if not HAS_OPENPYXL:
         messages.error(request, 'openpyxl is not installed. Please install it to use XLSX export.')
         return redirect('dashboard')
-    
-    guests = Guest.objects.all().order_by('-id')
-    
-    # Create workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Guests"
-    
-    # Set column widths
-    ws.column_dimensions['A'].width = 25
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 20
-    ws.column_dimensions['D'].width = 15
-    
-    # Create header row
-    headers = ['Full Name', 'Email', 'Phone Number', 'QR Code']
-    ws.append(headers)
-    
-    # Style header row
-    header_fill = PatternFill(start_color="0D6EFD", end_color="0D6EFD", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Add guest data
-    for idx, guest in enumerate(guests, start=2):
-        ws.append([guest.full_name, guest.email, guest.phone_number, guest.qr_code_value])
-        
-        # Alternate row coloring
-        if idx % 2 == 0:
-            fill = PatternFill(start_color="F8F9FA", end_color="F8F9FA", fill_type="solid")
-            for cell in ws[idx]:
-                cell.fill = fill
-    
-    # Set response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="guests_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
-    wb.save(response)
-    
-    return response
+
+    guests = filter_guests(Guest.objects.all(), request.GET).order_by('-id')
+    return xlsx_response(guests, f'guests_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
 
 
 def import_guests(request):
-    """Import guests from CSV or XLSX file"""
+    """Store an uploaded CSV or XLSX file and import it in the background"""
     if request.method == 'POST':
         file = request.FILES.get('file')
         
@@ -184,182 +413,139 @@ def import_guests(request):
             messages.error(request, 'Please select a file to import.')
             return redirect('dashboard')
         
-        imported_count = 0
-        skipped_count = 0
-        errors = []
-        
-        try:
-            if file.name.endswith('.csv'):
-                # Handle CSV - try different encodings
-                try:
-                    decoded_file = file.read().decode('utf-8').splitlines()
-                except:
-                    file.seek(0)
-                    decoded_file = file.read().decode('latin-1').splitlines()
-                
-                reader = csv.DictReader(decoded_file)
-                
-                if not reader.fieldnames:
-                    messages.error(request, 'CSV file appears to be empty or invalid format.')
-                    return redirect('dashboard')
-                
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        if not row or all(v is None or str(v).strip() == '' for v in row.values()):
-                            continue
-                            
-                        full_name = str(row.get('Full Name', '') or '').strip()
-                        email = str(row.get('Email', '') or '').strip()
-                        phone_number = str(row.get('Phone Number', '') or '').strip()
-                        
-                        if not full_name or not email or not phone_number:
-                            skipped_count += 1
-                            errors.append(f"Row {row_num}: Missing required fields")
-                            continue
-                        
-                        # Check if guest already exists
-                        if Guest.objects.filter(email=email).exists():
-                            skipped_count += 1
-                            errors.append(f"Row {row_num}: Email {email} already exists")
-                            continue
-                        
-                        # Create guest
-                        guest = Guest.objects.create(
-                            full_name=full_name,
-                            email=email,
-                            phone_number=phone_number
-                        )
-                        
-                        # Generate QR code
-                        try:
-                            qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H)
-                            qr.add_data(guest.qr_code_value)
-                            qr.make(fit=True)
-                            qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGBA")
-
-                            logo_path = os.path.join(settings.BASE_DIR, "guest", "static", "images", "event-logo.jpg")
-                            logo = Image.open(logo_path).convert("RGBA")
-                            logo_width, logo_height = logo.size
-
-                            qr_width, qr_height = qr_img.size
-                            factor = 4
-                            qr_img = qr_img.resize((qr_width//factor, qr_height//factor))
-
-                            position = (10, logo_height - qr_img.height - 10)
-                            logo.paste(qr_img, position, qr_img)
-
-                            buffer = BytesIO()
-                            logo.save(buffer, format="PNG")
-                            guest.qr_image.save(f"{guest.qr_code_value}.png", ContentFile(buffer.getvalue()))
-                        except Exception as qr_error:
-                            print(f"QR Code generation error: {qr_error}")
-                        
-                        imported_count += 1
-                        
-                    except Exception as e:
-                        print(f"Row {row_num} error: {str(e)}")
-                        skipped_count += 1
-                        errors.append(f"Row {row_num}: {str(e)[:50]}")
-            
-            elif file.name.endswith(('.xlsx', '.xls')):
-                # Handle XLSX
-                if not HAS_OPENPYXL:
-                    messages.error(request, 'openpyxl is not installed. Cannot import XLSX files.')
-                    return redirect('dashboard')
-                
-                try:
-                    wb = openpyxl.load_workbook(file)
-                    ws = wb.active
-                    
-                    if not ws:
-                        messages.error(request, 'Excel file appears to be empty.')
-                        return redirect('dashboard')
-                    
-                    for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                        try:
-                            if not row or all(v is None or str(v).strip() == '' for v in row):
-                                continue
-                                
-                            full_name = str(row[0] or '').strip()
-                            email = str(row[1] or '').strip()
-                            phone_number = str(row[2] or '').strip()
-                            
-                            if not full_name or not email or not phone_number:
-                                skipped_count += 1
-                                errors.append(f"Row {row_num}: Missing required fields")
-                                continue
-                            
-                            # Check if guest already exists
-                            if Guest.objects.filter(email=email).exists():
-                                skipped_count += 1
-                                errors.append(f"Row {row_num}: Email {email} already exists")
-                                continue
-                            
-                            # Create guest
-                            guest = Guest.objects.create(
-                                full_name=full_name,
-                                email=email,
-                                phone_number=phone_number
-                            )
-                            
-                            # Generate QR code
-                            try:
-                                qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H)
-                                qr.add_data(guest.qr_code_value)
-                                qr.make(fit=True)
-                                qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGBA")
-
-                                logo_path = os.path.join(settings.BASE_DIR, "guest", "static", "images", "event-logo.jpg")
-                                logo = Image.open(logo_path).convert("RGBA")
-                                logo_width, logo_height = logo.size
-
-                                qr_width, qr_height = qr_img.size
-                                factor = 4
-                                qr_img = qr_img.resize((qr_width//factor, qr_height//factor))
-
-                                position = (10, logo_height - qr_img.height - 10)
-                                logo.paste(qr_img, position, qr_img)
-
-                                buffer = BytesIO()
-                                logo.save(buffer, format="PNG")
-                                guest.qr_image.save(f"{guest.qr_code_value}.png", ContentFile(buffer.getvalue()))
-                            except Exception as qr_error:
-                                print(f"QR Code generation error: {qr_error}")
-                            
-                            imported_count += 1
-                            
-                        except Exception as e:
-                            print(f"Row {row_num} error: {str(e)}")
-                            skipped_count += 1
-                            errors.append(f"Row {row_num}: {str(e)[:50]}")
-                except Exception as excel_error:
-                    messages.error(request, f'Error reading Excel file: {str(excel_error)[:100]}')
-                    print(f"Excel error: {str(excel_error)}")
-                    return redirect('dashboard')
-            
-            else:
-                messages.error(request, 'Please upload a CSV or XLSX file.')
-                return redirect('dashboard')
-            
-            # Show results
-            if imported_count > 0:
-                messages.success(request, f'✓ Successfully imported {imported_count} guest(s)!')
-            if skipped_count > 0:
-                error_msg = f'⚠ Skipped {skipped_count} rows.'
-                if errors:
-                    error_msg += f' Reasons: ' + '; '.join(errors[:3])
-                    if len(errors) > 3:
-                        error_msg += f'... and {len(errors) - 3} more'
-                messages.warning(request, error_msg)
-            
-            if imported_count == 0 and skipped_count == 0:
-                messages.info(request, 'No data to import from file.')
-            
-        except Exception as e:
-            print(f"Import error: {str(e)}")
-            messages.error(request, f'Error importing file: {str(e)[:100]}')
-        
-        return redirect('dashboard')
+        if not is_supported(file.name):
+            messages.error(request, 'Please upload a CSV or XLSX file.')
+            return redirect('dashboard')
+
+        guest_import = start_import(file)
+        messages.info(request, f'Importing {guest_import.original_name} in the background.')
+        return redirect(f"{reverse('dashboard')}?import={guest_import.pk}")
     
     return redirect('dashboard')
 
+
+def _import_json(guest_import):
+    return {
+        'id': guest_import.pk,
+        'file': guest_import.original_name,
+        'status': guest_import.status,
+        'finished': guest_import.finished,
+        'rows_processed': guest_import.rows_processed,
+        'imported': guest_import.imported,
+        'skipped': guest_import.skipped,
+        'rows_per_second': round(guest_import.rows_per_second(), 1),
+        'error': guest_import.error,
+        'errors_url': reverse('import_errors', args=[guest_import.pk]) if guest_import.skipped else None,
+    }
+
+
+@require_GET
+def import_status(request, pk):
+    """Progress of a background import, for polling"""
+    guest_import = get_object_or_404(GuestImport, pk=pk)
+    response = JsonResponse(_import_json(guest_import))
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_GET
+def import_errors(request, pk):
+    """Every skipped row of an import and why, as CSV"""
+    guest_import = get_object_or_404(GuestImport, pk=pk)
+    writer = csv.writer(Echo())
+    rows = guest_import.row_errors.values_list('row_num', 'reason').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    def lines():
+        yield writer.writerow(['Row', 'Reason'])
+        for row in rows:
+            yield writer.writerow(row)
+
+    stem = guest_import.original_name.rsplit('.', 1)[0]
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{stem}-errors.csv"'
+    return response
+
+
+def _scanner_denied(request):
+    """
+    401 unless the request carries the CHECKIN_TOKEN bearer token. Check-in
+    endpoints admit guests and list every code, so with no token configured
+    they are closed.
+    """
+    token = settings.CHECKIN_TOKEN
+    header = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        return None
+    response = JsonResponse({'error': 'Scanner token required'}, status=401)
+    response['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def checkin(request, code):
+    """Door scan: admit the guest holding `code`. Safe to repeat; later scans report the first check-in."""
+    if denied := _scanner_denied(request):
+        return denied
+    result = check_in(code.strip().upper())
+    if result is None:
+        return JsonResponse({'code': code, 'error': 'Unknown code'}, status=404)
+    return JsonResponse(result)
+
+
+def _since_param(request):
+    try:
+        return max(int(request.GET.get('since') or 0), 0)
+    except ValueError:
+        return 0
+
+
+@require_GET
+def checkin_manifest(request):
+    """Guest list for scanner devices to cache; ?since=<version> returns only changes"""
+    if denied := _scanner_denied(request):
+        return denied
+    manifest = JsonResponse(build_manifest(_since_param(request)))
+    # Hashed from the body, not the version: a change committing late alters a manifest without moving its version
+    etag = f'"{hashlib.md5(manifest.content).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag) or manifest
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def checkin_batch(request):
+    """Upload of scans queued offline: {"scans": [{"code": ..., "scanned_at": ...}, ...]}"""
+    if denied := _scanner_denied(request):
+        return denied
+    try:
+        scans = json.loads(request.body)['scans']
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest('Expected JSON body {"scans": [...]}')
+    if not isinstance(scans, list) or not all(isinstance(scan, dict) for scan in scans):
+        return HttpResponseBadRequest('"scans" must be a list of objects')
+    if len(scans) > MAX_BATCH_SCANS:
+        return HttpResponseBadRequest(f'At most {MAX_BATCH_SCANS} scans per batch')
+
+    results = apply_scans(scans)
+    return JsonResponse({'results': results, 'version': manifest_version()})
+
+
+@require_GET
+def metrics(request):
+    """
+    Request, SQL and span metrics for this process in Prometheus text format.
+    Scrapers send the METRICS_TOKEN bearer token; with no token configured the
+    endpoint does not exist.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        raise Http404
+    header = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
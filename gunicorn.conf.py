@@ -0,0 +1,42 @@
+"""
+Gunicorn settings. GUNICORN_PROFILE picks how requests are served:
+
+  sync     core.wsgi with threaded sync workers (default)
+  uvicorn  core.asgi with uvicorn workers and the async views
+
+GUNICORN_PRELOAD=True loads the app once in the master before forking, so
+workers start faster and share its memory (see guest.startup). Code changes
+then need a full restart rather than a HUP.
+"""
+import os
+
+profile = os.getenv("GUNICORN_PROFILE", "sync")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# cpu_count() reports the host's cores inside a container, and every worker holds the app
+# and its own database connections, so scale up by setting WEB_CONCURRENCY instead
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+accesslog = "-"
+preload_app = os.getenv("GUNICORN_PRELOAD") == "True"
+
+if profile == "uvicorn":
+    wsgi_app = "core.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    os.environ.setdefault("ASYNC_VIEWS", "True")
+    # Under ASGI each request gets a fresh thread, so persistent connections would pile up
+    os.environ.setdefault("DB_CONN_MAX_AGE", "0")
+elif profile == "sync":
+    wsgi_app = "core.wsgi:application"
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+else:
+    raise ValueError(f"Unknown GUNICORN_PROFILE {profile!r}; use 'sync' or 'uvicorn'")
+
+
+def when_ready(server):
+    # Runs in the master before the first fork
+    if preload_app:
+        from guest.startup import preload
+
+        preload()